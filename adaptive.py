@@ -0,0 +1,159 @@
+import numpy as np
+
+from events import crossed, locate
+from instrumentation import instrument
+
+# Adaptive Runge-Kutta 4(5) of Dormand and Prince with step-size control,
+# step statistics and a 4th-order continuous extension (dense output).
+#
+# rhs(t, y) takes and returns a 1-D state vector. Steps are accepted when the
+# embedded error estimate, scaled by atol + rtol * |y|, has RMS norm <= 1.
+
+C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])  # Error weights b - b*
+P = np.array([
+    [1, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+    [0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+    [0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+    [0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+    [0, 40617522/29380423, -110615467/29380423, 69997945/29380423],
+])
+
+SAFETY = 0.9
+MIN_FACTOR = 0.2
+MAX_FACTOR = 10.0
+
+
+def _dense(t0, y0, h, K, t):
+    # Continuous extension inside one step, t a scalar
+    x = (t - t0) / h
+    return y0 + h * np.dot(np.dot(P.T, K).T, x ** np.arange(1, 5))
+
+
+class AdaptiveSolution:
+    # Accepted steps plus what is needed to interpolate inside any of them.
+    # After a terminal event the last step may overshoot it; t_events holds
+    # the exact times (nan where an event never fired) and y_events the states.
+
+    def __init__(self, t, y, K, n_eval, n_accept, n_reject, t_events=(), y_events=()):
+        self.t = t              # (steps + 1,) accepted times
+        self.y = y              # (steps + 1, n) states at those times
+        self._K = K             # (steps, 7, n) stage derivatives of each step
+        self.n_eval = n_eval
+        self.n_accept = n_accept
+        self.n_reject = n_reject
+        self.t_events = list(t_events)
+        self.y_events = list(y_events)
+
+    def stats(self):
+        return {'n_eval': self.n_eval, 'n_accept': self.n_accept, 'n_reject': self.n_reject}
+
+    def __call__(self, t):
+        # Dense output: 4th-order interpolant inside each accepted step
+        t = np.asarray(t, dtype=float)
+        flat = t.ravel()
+        i = np.clip(np.searchsorted(self.t, flat, side='right') - 1, 0, len(self.t) - 2)
+        h = self.t[i+1] - self.t[i]
+        x = (flat - self.t[i]) / h
+        powers = np.cumprod(np.repeat(x[:, None], 4, axis=1), axis=1)  # x, x^2, x^3, x^4
+        Q = np.einsum('msn,sp->mpn', self._K[i], P)
+        y = self.y[i] + h[:, None] * np.einsum('mpn,mp->mn', Q, powers)
+        return y.reshape(t.shape + (self.y.shape[1],))
+
+
+def _initial_step(rhs, t0, y0, f0, rtol, atol):
+    # Hairer, Norsett & Wanner's starting step estimate
+    scale = atol + np.abs(y0) * rtol
+    d0 = np.sqrt(np.mean((y0 / scale)**2))
+    d1 = np.sqrt(np.mean((f0 / scale)**2))
+    h0 = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+    f1 = rhs(t0 + h0, y0 + h0 * f0)
+    d2 = np.sqrt(np.mean(((f1 - f0) / scale)**2)) / h0
+    if max(d1, d2) <= 1e-15:
+        h1 = max(1e-6, h0 * 1e-3)
+    else:
+        h1 = (0.01 / max(d1, d2))**(1 / 5)
+    return min(100 * h0, h1)
+
+
+def dopri45(rhs, t_span, y0, rtol=1e-6, atol=1e-9, h0=None, max_steps=10**6, events=()):
+    # events: events.Event instances; crossings are located on the dense output
+    rhs = instrument.wrap(rhs, 'rhs_evals', 'force')
+    t, t_end = map(float, t_span)
+    y = np.array(y0, dtype=float)
+    n = len(y)
+    events = list(events)
+    t_events = [np.nan] * len(events)
+    y_events = [np.full(n, np.nan) for _ in events]
+    g_old = [float(ev(t, y)) for ev in events]
+    f = rhs(t, y)
+    n_eval = 1
+    if h0 is None:
+        h = _initial_step(rhs, t, y, f, rtol, atol)
+        n_eval += 1
+    else:
+        h = h0
+
+    ts, ys, Ks = [t], [y.copy()], []
+    n_accept = n_reject = 0
+    K = np.empty((7, n))
+    while t < t_end:
+        if n_accept >= max_steps:
+            raise RuntimeError(f"dopri45 exceeded max_steps={max_steps} at t={t}")
+        last = h >= t_end - t
+        if last:
+            h = t_end - t
+        K[0] = f
+        for s in range(1, 6):
+            K[s] = rhs(t + C[s] * h, y + h * (np.dot(A[s], K[:s])))
+        y_new = y + h * np.dot(A[6], K[:6])
+        K[6] = rhs(t + h, y_new)  # Last stage is the first of the next step (FSAL)
+        n_eval += 6
+
+        scale = atol + np.maximum(np.abs(y), np.abs(y_new)) * rtol
+        err = np.sqrt(np.mean((h * np.dot(E, K) / scale)**2))
+        if err <= 1.0:
+            t_old, y_old = t, y
+            t = t_end if last else t + h
+            y = y_new
+            f = K[6].copy()
+            ts.append(t)
+            ys.append(y.copy())
+            Ks.append(K.copy())
+            n_accept += 1
+            factor = MAX_FACTOR if err == 0 else min(MAX_FACTOR, SAFETY * err**-0.2)
+
+            stop = False
+            for k, ev in enumerate(events):
+                g_new = float(ev(t, y))
+                if np.isnan(t_events[k]) and crossed(g_old[k], g_new, ev.direction):
+                    K_step = Ks[-1]
+
+                    def interp(tc):
+                        return _dense(t_old, y_old, t - t_old, K_step, tc)
+                    t_events[k] = float(locate(ev, t_old, t, g_old[k], g_new, interp))
+                    y_events[k] = interp(t_events[k])
+                    stop |= ev.terminal
+                g_old[k] = g_new
+            if stop:
+                break
+        else:
+            n_reject += 1
+            factor = max(MIN_FACTOR, SAFETY * err**-0.2)
+        h *= factor
+
+    instrument.count('accepted_steps', n_accept)
+    instrument.count('rejected_steps', n_reject)
+    return AdaptiveSolution(np.array(ts), np.array(ys), np.array(Ks).reshape(-1, 7, n),
+                            n_eval, n_accept, n_reject, t_events, y_events)
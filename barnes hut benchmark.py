@@ -0,0 +1,69 @@
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+
+from nbody import direct_accelerations
+from barnes_hut import barnes_hut_accelerations
+
+# Parameters
+N_values = [500, 1000, 2000, 4000, 8000, 16000]  # Number of bodies
+theta_values = [0.3, 0.5, 0.8]  # Barnes-Hut opening angles
+dim = 3          # Octree (3) or quadtree (2)
+softening = 0.01
+repeats = 3      # Best of several runs
+rng = np.random.default_rng(0)
+
+# Plummer-like cluster of equal masses
+def make_cluster(n):
+    r = 1.0 / np.sqrt(rng.random(n)**(-2/3) - 1)
+    direction = rng.normal(size=(n, dim))
+    direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+    return r[:, None] * direction, np.full(n, 1.0 / n)
+
+def best_time(f, *args, **kwargs):
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = f(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+direct_times = []
+tree_times = {theta: [] for theta in theta_values}
+tree_errors = {theta: [] for theta in theta_values}
+
+print("N\tdirect (s)\t" + "\t".join(f"BH theta={theta} (s, median rel. err)" for theta in theta_values))
+for n in N_values:
+    pos, mass = make_cluster(n)
+    t_direct, a_direct = best_time(direct_accelerations, pos, mass, softening=softening)
+    direct_times.append(t_direct)
+    row = f"{n}\t{t_direct:.4f}"
+    for theta in theta_values:
+        t_tree, a_tree = best_time(barnes_hut_accelerations, pos, mass, softening=softening, theta=theta)
+        error = np.median(np.linalg.norm(a_tree - a_direct, axis=1) / np.linalg.norm(a_direct, axis=1))
+        tree_times[theta].append(t_tree)
+        tree_errors[theta].append(error)
+        row += f"\t{t_tree:.4f}, {error:.2e}"
+    print(row)
+
+# Plot results
+fig, ax = plt.subplots(1, 2, figsize=(12, 5))
+ax[0].loglog(N_values, direct_times, 'k-o', label='Direct summation')
+for theta in theta_values:
+    ax[0].loglog(N_values, tree_times[theta], '--o', label=f'Barnes-Hut theta={theta}')
+ax[0].set_xlabel("Number of bodies N")
+ax[0].set_ylabel("Time per force evaluation (s)")
+ax[0].set_title("Force Evaluation Time")
+ax[0].legend()
+ax[0].grid()
+
+for theta in theta_values:
+    ax[1].semilogx(N_values, tree_errors[theta], '--o', label=f'theta={theta}')
+ax[1].set_xlabel("Number of bodies N")
+ax[1].set_ylabel("Median relative force error")
+ax[1].set_title("Barnes-Hut Accuracy vs Direct Summation")
+ax[1].legend()
+ax[1].grid()
+
+plt.tight_layout()
+plt.show()
@@ -0,0 +1,150 @@
+import numpy as np
+
+# Barnes-Hut tree code for gravitational accelerations, O(N log N).
+#
+# The tree is a quadtree in 2D and an octree in 3D, stored as flat arrays
+# rather than one Python object per node. Bodies are sorted along a Morton
+# (Z-order) curve, so every node covers a contiguous range [start, end) of the
+# sorted bodies and its mass and centre of mass come straight from prefix sums.
+# The force walk is vectorized over (body, node) pairs one tree level at a time.
+
+
+def _morton_keys(q, depth):
+    # Interleave the bits of the integer cell coordinates q (N, dim)
+    dim = q.shape[1]
+    keys = np.zeros(len(q), dtype=np.int64)
+    for bit in range(depth):
+        for k in range(dim):
+            keys |= ((q[:, k] >> bit) & 1) << (bit * dim + k)
+    return keys
+
+
+class Tree:
+
+    def __init__(self, pos, mass, leaf_size=8, depth=None):
+        pos = np.asarray(pos, dtype=float)
+        mass = np.asarray(mass, dtype=float)
+        n, dim = pos.shape
+        if depth is None:
+            depth = min(21, 62 // dim)  # Keys must fit in an int64
+        self.dim = dim
+
+        lo = pos.min(axis=0)
+        size = max(np.max(pos.max(axis=0) - lo), 1e-300) * (1 + 1e-12)
+        q = np.minimum(((pos - lo) / size * 2**depth).astype(np.int64), 2**depth - 1)
+        keys = _morton_keys(q, depth)
+        order = np.argsort(keys, kind='stable')
+        self.order = order
+        self.pos = pos[order]
+        self.mass = mass[order]
+        keys, q = keys[order], q[order]
+
+        # Prefix sums give mass and centre of mass of any contiguous range
+        cm = np.concatenate(([0.0], np.cumsum(self.mass)))
+        cmx = np.vstack((np.zeros(dim), np.cumsum(self.mass[:, None] * self.pos, axis=0)))
+
+        starts, ends, levels = [np.array([0])], [np.array([n])], [np.array([0])]
+        first_child = []
+        n_children = []
+        node_count = 1
+        level_start, level_end = starts[0], ends[0]
+        for level in range(depth + 1):
+            split = (level_end - level_start > leaf_size) & (level < depth)
+            fc = np.full(len(level_start), -1, dtype=np.int64)
+            nc = np.zeros(len(level_start), dtype=np.int64)
+            if split.any():
+                s, e = level_start[split], level_end[split]
+                counts = e - s
+                idx = np.repeat(s - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                prefix = keys[idx] >> (dim * (depth - level - 1))
+                new = np.concatenate(([True], prefix[1:] != prefix[:-1]))
+                child_start = idx[new]
+                child_end = np.append(idx[np.flatnonzero(new)[1:] - 1] + 1, idx[-1] + 1)
+
+                # Children of one parent are consecutive runs inside its range
+                parent = np.searchsorted(s, child_start, side='right') - 1
+                per_parent = np.bincount(parent, minlength=len(s))
+                fc[split] = node_count + np.cumsum(per_parent) - per_parent
+                nc[split] = per_parent
+                node_count += len(child_start)
+                level_start, level_end = child_start, child_end
+            first_child.append(fc)
+            n_children.append(nc)
+            if not split.any():
+                break
+            starts.append(level_start)
+            ends.append(level_end)
+            levels.append(np.full(len(level_start), level + 1))
+
+        self.start = np.concatenate(starts)
+        self.end = np.concatenate(ends)
+        self.level = np.concatenate(levels)
+        self.first_child = np.concatenate(first_child)
+        self.n_children = np.concatenate(n_children)
+        self.node_mass = cm[self.end] - cm[self.start]
+        massive = self.node_mass > 0
+        self.com = self.pos[self.start].copy()  # Massless nodes sit on a body
+        self.com[massive] = ((cmx[self.end] - cmx[self.start])[massive]
+                             / self.node_mass[massive, None])
+        self.width = size / 2.0**self.level  # Side length of each cell
+
+    def __len__(self):
+        return len(self.start)
+
+
+def barnes_hut_accelerations(pos, mass, G=4 * np.pi**2, softening=0.0, theta=0.5,
+                             leaf_size=8, chunk=4096):
+    # A node of width w at distance d from a body is used as a point mass
+    # when w / d < theta, otherwise it is opened. theta = 0 reduces to direct
+    # summation, larger theta trades accuracy for speed.
+    tree = Tree(pos, mass, leaf_size=leaf_size)
+    p = tree.pos
+    n, dim = p.shape
+    eps2 = softening**2
+    theta2 = theta**2
+    acc = np.zeros((n, dim))
+
+    for c0 in range(0, n, chunk):
+        c1 = min(c0 + chunk, n)
+        local = acc[c0:c1]
+        bodies = np.arange(c0, c1)
+        nodes = np.zeros(len(bodies), dtype=np.int64)
+        while len(bodies):
+            dr = tree.com[nodes] - p[bodies]
+            d2 = np.einsum('ij,ij->i', dr, dr)
+            inside = (tree.start[nodes] <= bodies) & (bodies < tree.end[nodes])
+            far = ~inside & (tree.width[nodes]**2 < theta2 * d2)
+            leaf = ~far & (tree.n_children[nodes] == 0)
+
+            # Well separated nodes act as point masses at their centre of mass
+            if far.any():
+                b, r = bodies[far], dr[far]
+                w = G * tree.node_mass[nodes[far]] * (d2[far] + eps2)**-1.5
+                for k in range(dim):
+                    local[:, k] += np.bincount(b - c0, weights=w * r[:, k], minlength=c1 - c0)
+
+            # Leaves are summed body by body
+            if leaf.any():
+                b, nd = bodies[leaf], nodes[leaf]
+                counts = tree.end[nd] - tree.start[nd]
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                b = np.repeat(b, counts)
+                j = np.repeat(tree.start[nd], counts) + offsets
+                keep = j != b
+                b, j = b[keep], j[keep]
+                r = p[j] - p[b]
+                w = G * tree.mass[j] * (np.einsum('ij,ij->i', r, r) + eps2)**-1.5
+                for k in range(dim):
+                    local[:, k] += np.bincount(b - c0, weights=w * r[:, k], minlength=c1 - c0)
+
+            # Everything else is opened into its children
+            open_ = ~far & ~leaf
+            b, nd = bodies[open_], nodes[open_]
+            counts = tree.n_children[nd]
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            bodies = np.repeat(b, counts)
+            nodes = np.repeat(tree.first_child[nd], counts) + offsets
+
+    out = np.empty_like(acc)
+    out[tree.order] = acc
+    return out
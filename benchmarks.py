@@ -0,0 +1,418 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from integrators import (integrate, shm_rhs, damped_rhs, pendulum_rhs, driven_pendulum_rhs,
+                         rlc_rhs, drag_fall_rhs, projectile_rhs)
+from linear_models import solve_linear
+from lorentz import BorisPusher, simulate_lorentz
+from nbody import NBodySystem
+from orbits import simulate_orbit
+from oscillator_network import OscillatorNetwork
+from pendulum import trajectory
+from projectile_sweep import sweep
+from rlc_response import frequency_response, transient
+from spring_lattice import SpringLattice
+from wax import WaxCooling
+
+# Benchmark suite for the time-stepping kernels.
+#
+# Every kernel is timed at several step counts and batch sizes and reported as
+# ns per lane-step, lane-steps per second and peak traced memory. Results are
+# saved as JSON so runs can be compared across commits:
+#
+#   python benchmarks.py --out new.json --compare old.json --threshold 0.2
+#
+# exits with status 1 if any kernel got more than 20% slower per step.
+#
+# A benchmark is a setup function (steps, batch) -> run, registered with
+# @benchmark; run() does the work and is what gets timed. Each kernel has its
+# own size grid, and sizes whose cost(steps, batch) exceeds its budget are
+# skipped, so quadratic kernels such as nbody and the closed forms, which
+# build (batch, steps) arrays, stay within time and memory. The JSON also
+# holds every kernel's scaling series (time against batch at each step count
+# and against steps at each batch), which --plot DIR draws as one log-log
+# figure per kernel.
+
+BENCHMARKS = {}
+
+STEPS = (1000, 10000)
+BATCHES = (1, 100, 10000)
+BUDGET = 10**8              # Lane-steps per measurement
+CLOSED_FORM_BUDGET = 10**7  # Elements of a (batch, steps) result
+
+
+def benchmark(name, steps=STEPS, batch=BATCHES, budget=BUDGET, cost=None):
+    def register(setup):
+        setup.steps = tuple(steps)
+        setup.batch = tuple(batch)
+        setup.budget = budget
+        setup.cost = cost or (lambda s, b: s * b)
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _lanes(batch, value, spread=0.1):
+    return value * (1 + spread * np.linspace(0, 1, batch))
+
+
+def _oscillator(rhs, steps, batch, method='euler-cromer'):
+    y0 = np.column_stack((_lanes(batch, 1.0), np.zeros(batch)))
+
+    def run():
+        integrate(rhs, y0, 10.0 / steps, steps, method, record=False)
+    return run
+
+
+@benchmark('shm')
+def bench_shm(steps, batch):
+    return _oscillator(shm_rhs(1.0, 1.0), steps, batch)
+
+
+@benchmark('damped')
+def bench_damped(steps, batch):
+    return _oscillator(damped_rhs(1.0, 1.0, 0.2), steps, batch)
+
+
+@benchmark('pendulum')
+def bench_pendulum(steps, batch):
+    return _oscillator(pendulum_rhs(9.8, 1.0), steps, batch)
+
+
+@benchmark('pendulum-exact', budget=CLOSED_FORM_BUDGET)
+def bench_pendulum_exact(steps, batch):
+    # Jacobi elliptic closed form at as many times as the stepped kernel takes steps
+    theta0 = _lanes(batch, 1.0)
+    t = np.linspace(0.0, 10.0, steps)
+
+    def run():
+        trajectory(t, theta0)
+    return run
+
+
+@benchmark('driven-pendulum')
+def bench_driven_pendulum(steps, batch):
+    # One lane per drive amplitude, as in a bifurcation sweep
+    return _oscillator(driven_pendulum_rhs(9.8, 9.8, 0.5, _lanes(batch, 1.35), 2.0 / 3.0),
+                       steps, batch, 'rk4')
+
+
+@benchmark('rlc')
+def bench_rlc(steps, batch):
+    return _oscillator(rlc_rhs(10.0, 1.0, 0.1, 10.0, 5.0), steps, batch)
+
+
+@benchmark('rlc-transient')
+def bench_rlc_transient(steps, batch):
+    # Same circuits as 'rlc' with the drive waveform precomputed in blocks
+    R = _lanes(batch, 10.0)
+
+    def run():
+        transient(R=R, dt=10.0 / steps, steps=steps, every=steps)
+    return run
+
+
+@benchmark('rlc-phasor', budget=CLOSED_FORM_BUDGET)
+def bench_rlc_phasor(steps, batch):
+    # Closed-form steady state over a (batch, steps) grid of R and omega
+    R = _lanes(batch, 10.0)[:, None]
+    omega = np.linspace(0.1, 20.0, steps)
+
+    def run():
+        frequency_response(R=R, omega=omega)
+    return run
+
+
+@benchmark('coupled')
+def bench_coupled(steps, batch):
+    # Two masses between walls as in coupled osc 1dim.py, state [x1, x2, v1, v2]
+    k, m1, m2 = 10.0, 1.5, 2.0
+
+    def rhs(t, y):
+        x1, x2 = y[:, 0:1], y[:, 1:2]
+        a1 = -(k / m1) * (2 * x1 - x2)
+        a2 = -(k / m2) * (2 * x2 - x1)
+        return np.hstack((y[:, 2:], a1, a2))
+    y0 = np.column_stack((_lanes(batch, 0.1), np.full(batch, 0.1), np.zeros((batch, 2))))
+
+    def run():
+        integrate(rhs, y0, 10.0 / steps, steps, 'euler-cromer', record=False)
+    return run
+
+
+@benchmark('free-fall')
+def bench_free_fall(steps, batch):
+    rhs = drag_fall_rhs(9.8, 0.1, 1.0)
+    y0 = np.column_stack((_lanes(batch, 100.0), np.zeros(batch)))
+
+    def run():
+        # 10 s, the span of free fall3.py
+        integrate(rhs, y0, 10.0 / steps, steps, 'euler-cromer', record=False)
+    return run
+
+
+@benchmark('projectile-magnus')
+def bench_projectile(steps, batch):
+    rhs = projectile_rhs(9.81, 0.05, 0.2, S=0.01, spin=4 * 22 / 7)
+    v0 = _lanes(batch, 50.0)
+    y0 = np.column_stack((np.zeros((batch, 2)), v0 / np.sqrt(2), v0 / np.sqrt(2)))
+
+    def run():
+        integrate(rhs, y0, 5.0 / steps, steps, 'euler-cromer', record=False)
+    return run
+
+
+@benchmark('projectile-sweep')
+def bench_projectile_sweep(steps, batch):
+    # Lanes spread over drag coefficients; dt chosen so flights last ~steps
+    c = np.linspace(0.0, 0.01, batch)
+
+    def run():
+        sweep(c, np.radians(45), 50.0, dt=7.2 / steps, max_steps=steps)
+    return run
+
+
+@benchmark('orbit')
+def bench_orbit(steps, batch):
+    v0 = _lanes(batch, 2 * np.pi)
+
+    def run():
+        simulate_orbit('verlet', v0 if batch > 1 else float(v0[0]), dt=1.0 / steps, T=1.0,
+                       record=False)
+    return run
+
+
+@benchmark('nbody', steps=(100, 1000), batch=(10, 100, 1000), cost=lambda s, b: s * b * b)
+def bench_nbody(steps, batch):
+    # batch = number of bodies
+    rng = np.random.default_rng(0)
+    pos, vel = rng.normal(size=(batch, 3)), rng.normal(size=(batch, 3)) * 0.1
+
+    def run():
+        NBodySystem(pos, vel, np.full(batch, 1.0 / batch), softening=0.01).run(
+            1e-3, steps, 'verlet', record=False)
+    return run
+
+
+@benchmark('chain')
+def bench_chain(steps, batch):
+    # batch = number of masses in a fixed-end FPU chain (sparse stepping path)
+    chain = OscillatorNetwork.chain(batch, k=1.0, k3=0.5)
+    x0 = np.sin(np.pi * np.arange(1, batch + 1) / (batch + 1))
+
+    def run():
+        chain.simulate(x0, np.zeros(batch), 0.05, steps, 'verlet', every=steps)
+    return run
+
+
+@benchmark('spring-lattice')
+def bench_lattice(steps, batch):
+    # batch = number of nodes of a square lattice with its bottom row fixed
+    side = max(2, int(np.sqrt(batch)))
+    lattice = SpringLattice.grid((side, side), diagonals=True)
+    lattice.fixed[::side] = True
+    lattice.pos[:, 1] *= 1.01
+
+    def run():
+        lattice.run(0.01, steps, 'verlet', record=False)
+    return run
+
+
+@benchmark('lorentz-boris')
+def bench_boris(steps, batch):
+    v0 = np.column_stack((_lanes(batch, 1e5), np.zeros(batch), np.zeros(batch)))
+
+    def run():
+        BorisPusher(1.6e-19, 1.67e-27, (0, 0, 500), (0, 0, 0.01), 1e-9).run(0, v0, steps, record=False)
+    return run
+
+
+@benchmark('lorentz-euler-cromer')
+def bench_lorentz_ec(steps, batch):
+    v0 = np.column_stack((_lanes(batch, 1e5), np.zeros(batch), np.zeros(batch)))
+
+    def run():
+        simulate_lorentz(v0, 'euler-cromer', N=steps, record=False)
+    return run
+
+
+@benchmark('wax-cooling')
+def bench_wax(steps, batch):
+    # Lumped Newton cooling of the liquid wax, one mass per lane
+    h, A, c_liquid, T_env = 1.7, 0.1, 2100, 25
+    m = _lanes(batch, 0.5)[:, None]
+
+    def rhs(t, y):
+        return -h * A * (y - T_env) / (m * c_liquid)
+    y0 = np.full((batch, 1), 90.0)
+
+    def run():
+        integrate(rhs, y0, 3000.0 / steps, steps, 'euler', record=False)
+    return run
+
+
+@benchmark('wax-exact', budget=CLOSED_FORM_BUDGET)
+def bench_wax_exact(steps, batch):
+    # Piecewise closed form of the full liquid/plateau/solid curve, sampled
+    # at as many times as the stepped kernel takes steps
+    m = _lanes(batch, 0.5)
+    t = np.linspace(0.0, 30000.0, steps)
+
+    def run():
+        WaxCooling(m=m).temperature(t)
+    return run
+
+
+@benchmark('decay-exact', budget=CLOSED_FORM_BUDGET)
+def bench_decay(steps, batch):
+    k = _lanes(batch, 0.1)
+
+    def run():
+        solve_linear(100.0, 0.0, k, 50.0 / steps, steps, 'exact')
+    return run
+
+
+@benchmark('absorption-euler', budget=CLOSED_FORM_BUDGET)
+def bench_absorption(steps, batch):
+    mu = _lanes(batch, 0.05)
+
+    def run():
+        solve_linear(100.0, 0.0, mu, 50.0 / steps, steps, 'euler')
+    return run
+
+
+def measure(setup, steps, batch, repeats=3):
+    run = setup(steps, batch)
+    run()  # Warm up
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    work = steps * batch
+    return {'seconds': best, 'ns_per_step': best / work * 1e9,
+            'lane_steps_per_s': work / best, 'peak_bytes': peak}
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(names=None, steps_list=None, batch_list=None, repeats=3):
+    # steps_list and batch_list replace the kernels' own grids; the budgets
+    # still apply
+    results = []
+    for name in names or BENCHMARKS:
+        setup = BENCHMARKS[name]
+        for steps in steps_list or setup.steps:
+            for batch in batch_list or setup.batch:
+                if setup.cost(steps, batch) > setup.budget:
+                    print(f"{name:22s} steps={steps:<8d} batch={batch:<8d} skipped (over budget)")
+                    continue
+                r = measure(setup, steps, batch, repeats)
+                r.update(name=name, steps=steps, batch=batch)
+                results.append(r)
+                print(f"{name:22s} steps={steps:<8d} batch={batch:<8d} "
+                      f"{r['ns_per_step']:10.1f} ns/step  {r['lane_steps_per_s']:12.3e} steps/s  "
+                      f"{r['peak_bytes'] / 2**20:8.2f} MiB", flush=True)
+    meta = {'commit': _commit(), 'python': platform.python_version(),
+            'numpy': np.__version__, 'machine': platform.machine(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return {'meta': meta, 'results': results, 'scaling': scaling(results)}
+
+
+def scaling(results):
+    # Per kernel: seconds against batch at each step count ('batch') and
+    # against steps at each batch size ('steps')
+    series = {}
+    for r in results:
+        kernel = series.setdefault(r['name'], {'batch': {}, 'steps': {}})
+        for axis, fixed in (('batch', 'steps'), ('steps', 'batch')):
+            line = kernel[axis].setdefault(str(r[fixed]), {axis: [], 'seconds': []})
+            line[axis].append(r[axis])
+            line['seconds'].append(r['seconds'])
+    return series
+
+
+def plot_scaling(report, directory):
+    # One log-log figure of seconds against batch size per kernel
+    from render import render_many
+    os.makedirs(directory, exist_ok=True)
+    jobs = []
+    for name, kernel in report['scaling'].items():
+        series = [{'x': line['batch'], 'y': line['seconds'], 'label': f"steps={steps}",
+                   'marker': 'o'} for steps, line in kernel['batch'].items()]
+        spec = {'title': name, 'xlabel': 'Batch size', 'ylabel': 'Time (s)',
+                'xscale': 'log', 'yscale': 'log', 'series': series}
+        jobs.append((spec, os.path.join(directory, f"{name}.png")))
+    return render_many(jobs)
+
+
+def compare(old, new, threshold=0.2):
+    # Kernels whose ns/step grew by more than threshold (a fraction)
+    baseline = {(r['name'], r['steps'], r['batch']): r for r in old['results']}
+    regressions = []
+    for r in new['results']:
+        key = (r['name'], r['steps'], r['batch'])
+        if key in baseline:
+            ratio = r['ns_per_step'] / baseline[key]['ns_per_step']
+            if ratio > 1 + threshold:
+                regressions.append((key, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the simulation kernels.")
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run (default all: {', '.join(BENCHMARKS)})")
+    parser.add_argument('--steps', type=int, nargs='+',
+                        help="step counts (default: each kernel's own grid)")
+    parser.add_argument('--batch', type=int, nargs='+',
+                        help="batch sizes (default: each kernel's own grid)")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--out', help="write results to this JSON file")
+    parser.add_argument('--plot', metavar='DIR', help="write a scaling plot per kernel to DIR")
+    parser.add_argument('--compare', help="baseline JSON file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed slowdown per step before failing (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    report = run_suite(args.names, args.steps, args.batch, args.repeats)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.plot:
+        plot_scaling(report, args.plot)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for (name, steps, batch), ratio in regressions:
+            print(f"REGRESSION {name} steps={steps} batch={batch}: {ratio:.2f}x slower per step")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
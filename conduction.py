@@ -0,0 +1,219 @@
+import numpy as np
+
+from wax import T_env, T_init, T_solid, c_liquid, c_solid, L, h
+
+# Spatially resolved solidification of wax: heat conduction in the enthalpy
+# formulation on a 1D slab or a 2D grid.
+#
+# Each cell carries its specific enthalpy e (J/kg, 0 = solid at T_solid):
+#
+#   e < 0       solid,  T = T_solid + e / c_solid
+#   0 <= e <= L mushy,  T = T_solid, liquid fraction e / L
+#   e > L       liquid, T = T_solid + (e - L) / c_liquid
+#
+# and rho de/dt = div(k grad T), with h (T - T_env) lost through the cooled
+# faces. Steps are backward Euler, so any dt is stable. Inside the solver the
+# plateau is given a tiny width MUSHY_WINDOW, which makes e(T) a continuous,
+# piecewise linear, increasing function, and every step solves
+#
+#   rho / dt (e(T) - e_old) - A (T - T_env) = 0
+#
+# with the nested Newton iteration of Casulli and Zanolli for piecewise linear
+# systems: e(T) is split into a difference of two convex functions, the outer
+# loop linearizes the second and the inner loop runs Newton on the first. Both
+# loops converge monotonically in a few iterations, however far a cell's
+# front moves in one step. Every linear solve is tridiagonal (Thomas
+# algorithm). In 2D the step is split into implicit x and y sweeps (locally
+# one-dimensional splitting), each solving all lines together, so a step
+# costs O(cells).
+
+# Wax properties not needed by the lumped model
+k_wax = 0.25    # Thermal conductivity (W/mK)
+rho_wax = 900   # Density (kg/m^3)
+
+MUSHY_WINDOW = 1e-4  # Width (K) the solver gives the isothermal plateau
+
+
+def temperature(e, T_solid=T_solid, c_liquid=c_liquid, c_solid=c_solid, L=L):
+    return np.where(e < 0, T_solid + e / c_solid,
+                    np.where(e > L, T_solid + (e - L) / c_liquid, T_solid))
+
+
+def enthalpy(T, T_solid=T_solid, c_liquid=c_liquid, c_solid=c_solid, L=L):
+    # Above T_solid the wax is taken to be liquid, at or below it solid
+    T = np.asarray(T, dtype=float)
+    return np.where(T > T_solid, L + c_liquid * (T - T_solid), c_solid * (T - T_solid))
+
+
+def thomas(lower, diag, upper, d):
+    # Solve the tridiagonal systems along axis 0. lower and upper are the
+    # (n,) off-diagonals shared by all systems, diag and d are (n, ...) with
+    # one independent system per trailing index (the lines of a 2D sweep).
+    n = len(d)
+    c = np.empty(diag.shape)
+    x = np.empty(d.shape)
+    inv = 1.0 / diag[0]
+    c[0] = upper[0] * inv
+    x[0] = d[0] * inv
+    for i in range(1, n):
+        inv = 1.0 / (diag[i] - lower[i] * c[i-1])
+        c[i] = upper[i] * inv
+        x[i] = (d[i] - lower[i] * x[i-1]) * inv
+    for i in range(n - 2, -1, -1):
+        x[i] -= c[i] * x[i+1]
+    return x
+
+
+def _axis_operator(n, dx, k, h_faces):
+    # Conduction along one axis as (lower, diag, upper) of -A per unit volume:
+    # k/dx^2 between cells, and a cooled face in series with half a cell,
+    # 1 / (1/h + dx/2k), at either end
+    coupling = k / dx**2
+    lower = np.full(n, -coupling)
+    upper = np.full(n, -coupling)
+    lower[0] = upper[-1] = 0.0
+    diag = np.full(n, 2 * coupling)
+    diag[0] = diag[-1] = coupling
+    if n == 1:
+        diag[0] = 0.0
+    for end, h_face in zip((0, -1), h_faces):
+        if h_face:
+            diag[end] += 1.0 / (1.0 / h_face + dx / (2 * k)) / dx
+    return lower, diag, upper
+
+
+class EnthalpyConduction:
+    # Shared stepping for Slab and Plate; subclasses set self.shape, self.dx
+    # (one spacing per axis) and self.h_faces (h of both faces per axis, 0 =
+    # insulated)
+
+    def __init__(self, T_init=T_init, T_env=T_env, k=k_wax, rho=rho_wax,
+                 c_liquid=c_liquid, c_solid=c_solid, L=L, T_solid=T_solid):
+        self.T_env = T_env
+        self.k = k
+        self.rho = rho
+        self.props = dict(T_solid=T_solid, c_liquid=c_liquid, c_solid=c_solid, L=L)
+        self.e = np.broadcast_to(enthalpy(T_init, **self.props), self.shape).copy()
+        self.t = 0.0
+        self.iterations = 0  # Linear solves in the last step
+        self._axes = [_axis_operator(n, dx, k, h_faces)
+                      for n, dx, h_faces in zip(self.shape, self.dx, self.h_faces)]
+
+    @property
+    def T(self):
+        return temperature(self.e, **self.props)
+
+    @property
+    def liquid_fraction(self):
+        return np.clip(self.e / self.props['L'], 0.0, 1.0)
+
+    # e(T) with the plateau spread over MUSHY_WINDOW, written as V1 - V2 with
+    # V1 and V2 convex and increasing; each returns its value and slope
+
+    def _v1(self, T):
+        T_solid = self.props['T_solid']
+        slope = np.where(T > T_solid, self.props['L'] / MUSHY_WINDOW, self.props['c_solid'])
+        return slope * (T - T_solid), slope
+
+    def _v2(self, T):
+        T_top = self.props['T_solid'] + MUSHY_WINDOW
+        slope = np.where(T > T_top, self.props['L'] / MUSHY_WINDOW - self.props['c_liquid'], 0.0)
+        return slope * (T - T_top), slope
+
+    def _implicit(self, e_old, dt, axis, tol, max_iter):
+        # Solve rho/dt (e(T) - e_old) + K (T - T_env) = 0 along axis 0 of
+        # e_old, with K = -A of one axis; returns the new enthalpy
+        lower, diag, upper = self._axes[axis]
+        column = (-1,) + (1,) * (e_old.ndim - 1)
+        row_sum = diag + np.append(lower[1:], 0.0) + np.append(0.0, upper[:-1])
+        diag = diag.reshape(column)
+        p = self.rho / dt
+        b = p * e_old + row_sum.reshape(column) * self.T_env
+        # Outer iterates rise towards the solution, so start at or below it
+        T = np.minimum(temperature(e_old, **self.props), self.props['T_solid'])
+        for _ in range(max_iter):
+            T_outer = T
+            v2, P2 = self._v2(T_outer)
+            for _ in range(max_iter):
+                v1, P1 = self._v1(T)
+                rhs = b - p * (v1 - P1 * T) + p * (v2 - P2 * T_outer)
+                T_new = thomas(lower, p * (P1 - P2) + diag, upper, rhs)
+                self.iterations += 1
+                change = np.max(np.abs(T_new - T))
+                T = T_new
+                if change < tol:
+                    break
+            if np.max(np.abs(T - T_outer)) < tol:
+                break
+        else:
+            raise RuntimeError(f"enthalpy solve did not converge in {max_iter} iterations")
+        return self._v1(T)[0] - self._v2(T)[0]
+
+    def step(self, dt, tol=1e-6, max_iter=50):
+        # One backward Euler step (x sweep, then y sweep in 2D); tol in kelvin
+        self.iterations = 0
+        e = self._implicit(self.e, dt, 0, tol, max_iter)
+        if len(self.shape) == 2:
+            e = self._implicit(e.T, dt, 1, tol, max_iter).T
+        self.e = np.ascontiguousarray(e)
+        self.t += dt
+
+    def heat_content(self):
+        # Enthalpy per unit area (1D) or length (2D), relative to solid at T_solid
+        return self.rho * np.sum(self.e) * np.prod(self.dx)
+
+    def run(self, dt, steps, every=1):
+        # Temperature and liquid fraction fields every `every` steps
+        n = steps // every + 1
+        t = np.empty(n)
+        T = np.empty((n,) + self.shape)
+        fraction = np.empty((n,) + self.shape)
+        t[0], T[0], fraction[0] = self.t, self.T, self.liquid_fraction
+        for i in range(1, steps + 1):
+            self.step(dt)
+            if i % every == 0:
+                j = i // every
+                t[j], T[j], fraction[j] = self.t, self.T, self.liquid_fraction
+        return t, T, fraction
+
+    def run_until_solid(self, dt, max_steps=10**6):
+        # Step until no cell holds liquid; returns the time taken
+        for _ in range(max_steps):
+            if np.all(self.e <= 0):
+                return self.t
+            self.step(dt)
+        raise RuntimeError(f"not solid after {max_steps} steps (t={self.t})")
+
+
+class Slab(EnthalpyConduction):
+    # Wax slab of the given thickness in n cells, cooled through the faces
+    # with h > 0; h=(h, 0) insulates the right face (e.g. against the mold)
+
+    def __init__(self, thickness, n, h=(h, h), **kwargs):
+        self.shape = (n,)
+        self.dx = (thickness / n,)
+        self.h_faces = (tuple(np.broadcast_to(h, 2)),)
+        super().__init__(**kwargs)
+
+    @property
+    def x(self):
+        return (np.arange(self.shape[0]) + 0.5) * self.dx[0]
+
+    def front(self):
+        # Positions where the liquid fraction crosses 1/2, interpolated between cells
+        f = self.liquid_fraction - 0.5
+        i = np.nonzero(np.sign(f[:-1]) != np.sign(f[1:]))[0]
+        x = self.x
+        return x[i] + (x[i+1] - x[i]) * f[i] / (f[i] - f[i+1])
+
+
+class Plate(EnthalpyConduction):
+    # Rectangular wax section, width x height in nx x ny cells; h_x and h_y
+    # are the heat transfer coefficients of the (left, right) and
+    # (bottom, top) faces
+
+    def __init__(self, width, height, nx, ny, h_x=(h, h), h_y=(h, h), **kwargs):
+        self.shape = (nx, ny)
+        self.dx = (width / nx, height / ny)
+        self.h_faces = (tuple(np.broadcast_to(h_x, 2)), tuple(np.broadcast_to(h_y, 2)))
+        super().__init__(**kwargs)
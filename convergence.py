@@ -0,0 +1,77 @@
+import numpy as np
+
+from integrators import integrate
+
+# Step-refinement convergence studies with Richardson extrapolation.
+#
+# newton to accuracy.py and newton mod h.py double n until the value at
+# t_target stops changing, rerunning every level from scratch to t_max and
+# interpolating back to t_target. Here a study keeps every level it has
+# computed, so refine() only pays for the new finest level. Each level steps
+# exactly to t_target, and the study extrapolates the levels to estimate the
+# converged value and the observed order. It usually stops several levels
+# earlier than the plain "change < tol" test.
+
+
+def fixed_step_solver(rhs, y0, t_target, method='euler', component=0, t0=0.0):
+    # solve(n) for any integrators.METHODS entry and right-hand side: the
+    # chosen state component at t_target after n equal steps
+    def solve(n):
+        _, y = integrate(rhs, y0, (t_target - t0) / n, n, method=method, t0=t0, record=False)
+        return y[..., component]
+    return solve
+
+
+class ConvergenceStudy:
+
+    def __init__(self, solve, n0=10, ratio=2):
+        # solve(n) returns the quantity of interest (a scalar or an array of
+        # lanes) computed with n steps; levels use n0, n0 * ratio, ...
+        self.solve = solve
+        self.ratio = ratio
+        self.n = []
+        self.values = []
+        self._next = n0
+
+    def refine(self):
+        self.values.append(np.asarray(self.solve(self._next), dtype=float))
+        self.n.append(self._next)
+        self._next *= self.ratio
+        return self.values[-1]
+
+    def observed_order(self):
+        # p from the last three levels: |v1 - v0| / |v2 - v1| = ratio^p
+        if len(self.values) < 3:
+            return np.nan
+        v0, v1, v2 = self.values[-3:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.log(np.abs(v1 - v0) / np.abs(v2 - v1)) / np.log(self.ratio)
+
+    def extrapolated(self, order=None):
+        # Richardson extrapolation of the two finest levels. The order is
+        # observed from the data unless the method's order is given.
+        if len(self.values) < 2:
+            return self.values[-1] if self.values else np.nan
+        p = self.observed_order() if order is None else order
+        coarse, fine = self.values[-2:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correction = (fine - coarse) / (self.ratio**p - 1)
+        return np.where(np.isfinite(correction), fine + correction, fine)
+
+    def run(self, tol, order=None, max_levels=30):
+        # Refine until successive extrapolated values agree to within tol
+        previous = None
+        while len(self.n) < max_levels:
+            self.refine()
+            if len(self.values) < (2 if order is not None else 3):
+                continue
+            estimate = self.extrapolated(order)
+            if previous is not None and np.all(np.abs(estimate - previous) < tol):
+                return estimate
+            previous = estimate
+        raise RuntimeError(f"no convergence to tol={tol} within {max_levels} levels")
+
+    def table(self):
+        # (n, value, change from previous level) per level, as in the scripts' plots
+        changes = [np.nan] + [np.max(np.abs(b - a)) for a, b in zip(self.values, self.values[1:])]
+        return list(zip(self.n, self.values, changes))
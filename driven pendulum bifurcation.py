@@ -0,0 +1,37 @@
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+
+from driven_pendulum import bifurcation, poincare_section
+
+# Parameters
+F_values = np.linspace(1.35, 1.5, 1000)  # Drive amplitudes, one batch lane each
+steps_per_period = 100
+transient = 300  # Drive periods discarded before sampling
+periods = 1000   # Drive periods sampled
+path = 'bifurcation.npy'
+
+if __name__ == '__main__':  # Worker processes import this file
+    start = time.perf_counter()
+    sections = bifurcation(F_values, path=path, steps_per_period=steps_per_period,
+                           transient=transient, periods=periods)
+    print(f"{len(F_values)} drive values x {periods} periods in {time.perf_counter() - start:.1f} s")
+
+    # Bifurcation diagram: theta at every sampled period against F
+    F_grid = np.repeat(F_values, sections.shape[1])
+    plt.figure(figsize=(10, 6))
+    plt.plot(F_grid, sections[:, :, 0].ravel(), ',k')
+    plt.xlabel("Drive amplitude F (rad/s^2)")
+    plt.ylabel("Theta (rad)")
+    plt.title("Driven Damped Pendulum: Bifurcation Diagram")
+    plt.grid()
+
+    # Poincare section of the chaotic pendulum at F = 1.2
+    section = poincare_section(1.2, transient=transient, periods=10 * periods)
+    plt.figure(figsize=(7, 6))
+    plt.plot(section[:, 0, 0], section[:, 0, 1], '.', markersize=1)
+    plt.xlabel("Theta (rad)")
+    plt.ylabel("Omega (rad/s)")
+    plt.title("Driven Damped Pendulum: Poincare Section (F = 1.2)")
+    plt.grid()
+    plt.show()
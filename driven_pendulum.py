@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from integrators import integrate, driven_pendulum_rhs
+from recorders import Recorder
+from trajectory_io import TrajectoryWriter
+
+# Poincare sections and bifurcation diagrams of the driven damped pendulum
+#
+#   theta'' = -(g/L) sin(theta) - q theta' + F cos(omega_d t)
+#
+# Every drive amplitude F (or any other parameter given per lane) is its own
+# batch lane. A run discards `transient` drive periods, then keeps the state
+# once per drive period, i.e. every steps_per_period steps, for `periods`
+# periods. The drive frequency omega_d is shared by all lanes, so the samples
+# of every lane fall at the same drive phase.
+#
+# The defaults (g/L = 1, q = 1/2, omega_d = 2/3) are the usual textbook
+# choice, with period doubling and chaos for F between about 1.35 and 1.5.
+#
+# A bifurcation diagram over many F values is split into blocks of lanes run
+# in worker processes; blocks come back in order and are streamed lane by
+# lane to a .npy file, which is returned memory-mapped.
+
+# Parameters
+g = 9.8  # Gravity (m/s^2)
+L = 9.8  # Length of pendulum (m)
+q = 0.5  # Damping (1/s)
+omega_d = 2.0 / 3.0  # Drive angular frequency (rad/s)
+
+
+def wrap_angle(theta):
+    # Angles folded into [-pi, pi)
+    return (np.asarray(theta) + np.pi) % (2 * np.pi) - np.pi
+
+
+def poincare_section(F, q=q, omega_d=omega_d, g=g, L=L, theta0=0.2, omega0=0.0,
+                     steps_per_period=100, transient=300, periods=1000, method='rk4',
+                     sink=None):
+    # (periods + 1, batch, 2) array of [theta, omega] once per drive period,
+    # with theta wrapped; the parameters broadcast to one lane per entry. A
+    # sink (trajectory_io.TrajectoryWriter with frame shape (batch, 2))
+    # receives the unwrapped samples instead and is returned.
+    omega_d = float(omega_d)
+    params = np.broadcast_arrays(*(np.atleast_1d(np.asarray(p, dtype=float))
+                                   for p in (F, q, g, L, theta0, omega0)))
+    F, q, g, L, theta0, omega0 = (p.ravel() for p in params)
+    rhs = driven_pendulum_rhs(g, L, q, F, omega_d)
+    dt = 2 * np.pi / omega_d / steps_per_period
+
+    _, y = integrate(rhs, np.column_stack((theta0, omega0)), dt,
+                     transient * steps_per_period, method, record=False)
+    y[:, 0] = wrap_angle(y[:, 0])
+    _, rec = integrate(rhs, y, dt, periods * steps_per_period, method,
+                       t0=transient * steps_per_period * dt,
+                       recorder=Recorder(every=steps_per_period, sink=sink))
+    if sink is not None:
+        return sink
+    section = rec.states
+    section[:, :, 0] = wrap_angle(section[:, :, 0])
+    return section
+
+
+def _section_block(kwargs):
+    return poincare_section(**kwargs)
+
+
+def bifurcation(F, path=None, max_workers=None, block=None, **params):
+    # Poincare sections for every drive amplitude in F, as an array of shape
+    # (len(F), periods + 1, 2). With a path (.npy) the lanes are streamed to
+    # disk as blocks finish and the memory-mapped file is returned.
+    # max_workers=1 runs in this process; params go to poincare_section and
+    # are shared by every lane.
+    F = np.atleast_1d(np.asarray(F, dtype=float))
+    workers = max_workers or os.cpu_count() or 1
+    if block is None:
+        block = -(-len(F) // workers)
+    jobs = [{**params, 'F': F[i:i + block]} for i in range(0, len(F), block)]
+    frame = (params.get('periods', 1000) + 1, 2)
+
+    writer = TrajectoryWriter(path, frame, chunk_size=block) if path is not None else None
+    sections = []
+    pool = None
+    if workers == 1 or len(jobs) <= 1:
+        results = map(_section_block, jobs)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_section_block, jobs)
+    try:
+        for section in results:
+            lanes = section.transpose(1, 0, 2)
+            if writer is not None:
+                writer.extend(lanes)
+            else:
+                sections.append(lanes)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        return writer.array()
+    return np.concatenate(sections)
@@ -0,0 +1,178 @@
+import numpy as np
+
+from instrumentation import instrument
+from integrators import METHODS
+
+# Event detection for the time steppers.
+#
+# An event is a function g(t, y) whose zero crossing marks something like the
+# ground impact (g = height). After every step the sign of g is compared with
+# the previous one; when it changes in the requested direction the crossing is
+# located inside the step by root finding on an interpolant of the step, so the
+# event time no longer snaps to the dt grid.
+
+
+class Event:
+
+    def __init__(self, fn, terminal=True, direction=0):
+        # direction: -1 only counts crossings from + to -, +1 from - to +,
+        # 0 counts both. Terminal events stop the lane that triggered them.
+        self.fn = fn
+        self.terminal = terminal
+        self.direction = direction
+
+    def __call__(self, t, y):
+        return self.fn(t, y)
+
+
+def ground_event(index=1):
+    # Height is column `index` of the state ([x, y, vx, vy] -> 1, [y, v] -> 0)
+    return Event(lambda t, y: y[..., index], terminal=True, direction=-1)
+
+
+def crossed(g0, g1, direction=0):
+    down = (g0 > 0) & (g1 <= 0)
+    up = (g0 < 0) & (g1 >= 0)
+    if direction < 0:
+        return down
+    if direction > 0:
+        return up
+    return down | up
+
+
+def _lanes(a, ndim):
+    # Trailing axes so per-lane times broadcast against (batch, state_dim)
+    a = np.asarray(a, dtype=float)
+    return a.reshape(a.shape + (1,) * (ndim - a.ndim))
+
+
+def hermite(t0, y0, f0, t1, y1, f1, t):
+    # Cubic Hermite interpolant of one step from the states and derivatives at
+    # both ends. The times may be scalars or one value per lane.
+    h = _lanes(np.subtract(t1, t0), np.ndim(y0))
+    s = _lanes(np.subtract(t, t0), np.ndim(y0)) / h
+    h00 = (1 + 2*s) * (1 - s)**2
+    h10 = s * (1 - s)**2
+    h01 = s**2 * (3 - 2*s)
+    h11 = s**2 * (s - 1)
+    return h00 * y0 + h10 * h * f0 + h01 * y1 + h11 * h * f1
+
+
+def locate(event, t0, t1, g0, g1, interp, xtol=1e-12, max_iter=100):
+    # Illinois (modified regula falsi) on every lane at once. The root stays
+    # bracketed in [a, b], and the stalled end has its value halved so
+    # convergence is superlinear.
+    a, b = np.array(t0, dtype=float), np.array(t1, dtype=float)
+    ga, gb = np.array(g0, dtype=float), np.array(g1, dtype=float)
+    side = np.zeros(np.shape(a), dtype=int)
+    tol = xtol * np.maximum(1.0, np.abs(b))
+    for _ in range(max_iter):
+        if np.all(b - a <= tol):
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = np.where(gb != ga, b - gb * (b - a) / (gb - ga), 0.5 * (a + b))
+        c = np.clip(c, a, b)
+        gc = event(c, interp(c))
+        left = np.sign(gc) == np.sign(ga)
+        # Root in [c, b]
+        a = np.where(left, c, a)
+        ga = np.where(left, gc, ga)
+        gb = np.where(left & (side == 1), 0.5 * gb, gb)
+        # Root in [a, c]
+        b = np.where(~left, c, b)
+        gb = np.where(~left, gc, gb)
+        ga = np.where(~left & (side == -1), 0.5 * ga, ga)
+        side = np.where(left, 1, -1)
+        done = gc == 0
+        a = np.where(done, c, a)
+        b = np.where(done, c, b)
+    return 0.5 * (a + b)
+
+
+class EventResult:
+
+    def __init__(self, t, y, t_events, y_events):
+        self.t = t                  # (n_steps + 1,) time grid
+        self.y = y                  # (n_steps + 1, batch, state_dim), frozen after a terminal
+                                    # event, or the final (batch, state_dim) for record=False
+        self.t_events = t_events    # One (batch,) array per event, nan where it never fired
+        self.y_events = y_events    # One (batch, state_dim) array per event
+
+
+def integrate_events(rhs, y0, dt, t_max, events, method='euler', t0=0.0, record=True):
+    # Batched fixed-step integration (integrators.METHODS) that stops each lane
+    # at its first terminal event and returns exact event times and states.
+    # Only the first occurrence of each event is recorded per lane. The
+    # derivatives for the interpolant are only evaluated on steps where some
+    # lane crosses, and root finding only runs on the lanes that crossed.
+    step = METHODS[method]
+    rhs = instrument.wrap(rhs, 'rhs_evals', 'force')
+    y = np.array(y0, dtype=float)
+    if y.ndim == 1:
+        y = y[None, :]
+    batch = len(y)
+    events = list(events)
+    t_events = [np.full(batch, np.nan) for _ in events]
+    y_events = [np.full(y.shape, np.nan) for _ in events]
+    active = np.ones(batch, dtype=bool)
+
+    steps = int(np.ceil((t_max - t0) / dt - 1e-9))
+    Y = [y.copy()] if record else None
+    t = t0
+    taken = 0
+    f_new = None  # rhs at the end of the previous step, when it was needed
+    g_old = [np.array(ev(t, y), dtype=float) for ev in events]  # Copies, y changes in place
+    for n in range(steps):
+        y_old = y.copy()
+        f_old = f_new
+        step(rhs, t, y, dt)
+        y[~active] = y_old[~active]  # Finished lanes stay where they stopped
+        t_new = t0 + (n + 1) * dt
+        taken += 1
+
+        g_new = [np.array(ev(t_new, y), dtype=float) for ev in events]
+        hits = [active & crossed(g_old[k], g_new[k], ev.direction) & np.isnan(t_events[k])
+                for k, ev in enumerate(events)]
+        f_new = None
+        if any(hit.any() for hit in hits):
+            if f_old is None:
+                f_old = rhs(t, y_old)
+            f_new = rhs(t_new, y)
+
+        def interp(tc, lanes):
+            return hermite(t, y_old[lanes], f_old[lanes], t_new, y[lanes], f_new[lanes], tc)
+
+        stop = np.zeros(batch, dtype=bool)
+        for k, ev in enumerate(events):
+            hit = hits[k]
+            if hit.any():
+                lanes = np.flatnonzero(hit)
+                n_hit = len(lanes)
+                tc = locate(ev, np.full(n_hit, t), np.full(n_hit, t_new), g_old[k][lanes],
+                            g_new[k][lanes], lambda c: interp(c, lanes))
+                t_events[k][lanes] = tc
+                y_events[k][lanes] = interp(tc, lanes)
+                if ev.terminal:
+                    stop |= hit
+            g_old[k] = g_new[k]
+
+        if stop.any():
+            # Terminal lanes end exactly on the event; the earliest one wins
+            lanes = np.flatnonzero(stop)
+            t_stop = np.full(len(lanes), np.inf)
+            for k, ev in enumerate(events):
+                if ev.terminal:
+                    tk = t_events[k][lanes]
+                    fired = tk >= t
+                    t_stop = np.where(fired & (tk < t_stop), tk, t_stop)
+            y[lanes] = interp(t_stop, lanes)
+            active &= ~stop
+        if record:
+            Y.append(y.copy())
+        t = t_new
+        if not active.any():
+            break
+
+    instrument.count('steps', taken)
+    time = t0 + dt * np.arange(taken + 1)
+    return EventResult(time, np.array(Y) if record else y, t_events, y_events)
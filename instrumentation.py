@@ -0,0 +1,129 @@
+import cProfile
+import contextlib
+import json
+import pstats
+import time
+from functools import wraps
+
+# Per-run instrumentation: evaluation counters, per-phase timers and cProfile.
+#
+# The integrators and force functions report into the module-level
+# `instrument`. It is off by default and then costs nothing in the inner
+# loops: wrap() hands back the original function unchanged, so the hot path
+# is identical to an uninstrumented run. Only while enabled are functions
+# wrapped to count calls and add their time to a phase.
+#
+#   from instrumentation import instrument
+#   instrument.enable()
+#   ... run ...
+#   print(instrument.summary())
+#
+# Counters: rhs_evals, force_evals, steps, accepted_steps, rejected_steps,
+# records. Phases: force (right-hand sides and accelerations), step (whole
+# steps where the force is not a separate call), record and plot.
+
+_NULL = contextlib.nullcontext()
+
+
+class Instrumentation:
+
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.timings = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        # Cleared in place: wrappers handed out before a reset keep reporting
+        self.counters.clear()
+        self.timings.clear()
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, phase, seconds):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def phase(self, name):
+        # Context manager timing a coarse phase (recording, plotting, ...)
+        if not self.enabled:
+            return _NULL
+        return self._timed(name)
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def wrap(self, fn, counter, phase=None):
+        # fn itself when disabled, otherwise a wrapper that counts each call
+        # under `counter` and adds its time to `phase`
+        if not self.enabled:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            self.counters[counter] = self.counters.get(counter, 0) + 1
+            if phase is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add_time(phase, time.perf_counter() - start)
+        return wrapper
+
+    def reports(self, counter, phase='force'):
+        # Decorator for public force functions called from user code; checks
+        # the flag on every call, so hot loops should use wrap() instead
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                return self.wrap(fn, counter, phase)(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def summary(self):
+        lines = []
+        if self.counters:
+            lines.append("Counter                       Count")
+            for name, n in sorted(self.counters.items()):
+                lines.append(f"{name:28s}{n:>8d}")
+        if self.timings:
+            total = sum(self.timings.values())
+            lines.append("Phase                      Time (s)   Share")
+            for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+                lines.append(f"{name:24s}{seconds:11.4f}{100 * seconds / total:7.1f}%")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump({'counters': self.counters, 'timings': self.timings}, f, indent=2)
+
+    @contextlib.contextmanager
+    def profile(self, path=None, sort='cumulative', top=25):
+        # Run a block under cProfile; write a pstats file to path or print the top entries
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            if path is not None:
+                profiler.dump_stats(path)
+            else:
+                pstats.Stats(profiler).sort_stats(sort).print_stats(top)
+
+
+instrument = Instrumentation()
@@ -0,0 +1,214 @@
+import numpy as np
+
+from instrumentation import instrument
+
+# Batched time stepping for a whole ensemble of initial conditions.
+#
+# The state is a (batch, state_dim) array. For second-order models the
+# columns are laid out as [positions | velocities], so state_dim is even and
+# the first half is advanced with the second half (the same layout as the
+# x/v and Q/I pairs in SHM.py, damped hosc.py, simple pendulum.py and RLC.py).
+# rhs(t, y) must return dy/dt with the same shape as y.
+
+
+def _column(p):
+    # Scalars broadcast as is, per-lane parameters become (batch, 1) columns
+    p = np.asarray(p, dtype=float)
+    return p if p.ndim == 0 else p.reshape(-1, 1)
+
+
+def euler_step(rhs, t, y, dt):
+    y += rhs(t, y) * dt
+    return y
+
+
+def euler_cromer_step(rhs, t, y, dt):
+    d = y.shape[1] // 2
+    dydt = rhs(t, y)
+    y[:, d:] += dydt[:, d:] * dt
+    y[:, :d] += y[:, d:] * dt  # Use updated velocity
+    return y
+
+
+def rk4_step(rhs, t, y, dt):
+    # Classic fourth-order Runge-Kutta, for when dt must be large
+    k1 = rhs(t, y)
+    k2 = rhs(t + 0.5 * dt, y + 0.5 * dt * k1)
+    k3 = rhs(t + 0.5 * dt, y + 0.5 * dt * k2)
+    k4 = rhs(t + dt, y + dt * k3)
+    y += (dt / 6.0) * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+    return y
+
+
+METHODS = {
+    'euler': euler_step,
+    'euler-cromer': euler_cromer_step,
+    'rk4': rk4_step,
+}
+
+
+def integrate(rhs, y0, dt, steps, method='euler', t0=0.0, record=True, recorder=None):
+    # record=True keeps every step, record=False only the final state and a
+    # recorders.Recorder decides itself what to keep (returned instead of Y,
+    # with its sample times instead of the full time grid)
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {sorted(METHODS)}")
+    step = METHODS[method]
+
+    y = np.array(y0, dtype=float)
+    if y.ndim == 1:
+        y = y[None, :]
+    if method == 'euler-cromer' and y.shape[1] % 2:
+        raise ValueError("euler-cromer needs a [positions | velocities] state with even state_dim")
+
+    rhs = instrument.wrap(rhs, 'rhs_evals', 'force')
+    instrument.count('steps', steps)
+    if recorder is not None:
+        # Times are computed per step so memory stays flat however many
+        # steps are taken; the recorder keeps the times it samples
+        recorder.begin(steps, t0, y)
+        keep = instrument.wrap(recorder, 'records', 'record')
+        for n in range(steps):
+            step(rhs, t0 + n * dt, y, dt)
+            keep(n + 1, t0 + (n + 1) * dt, y)
+        return recorder.t, recorder
+    time = t0 + dt * np.arange(steps + 1)
+    if not record:
+        for n in range(steps):
+            step(rhs, time[n], y, dt)
+        return time, y
+
+    Y = np.empty((steps + 1,) + y.shape)
+    Y[0] = y
+    for n in range(steps):
+        Y[n+1] = step(rhs, time[n], y, dt)
+    return time, Y
+
+
+# Right-hand sides of the single-script models, parameters may be scalars or
+# one value per batch lane
+
+def shm_rhs(k, m):
+    w2 = _column(k) / _column(m)
+
+    def rhs(t, y):
+        return np.hstack((y[:, 1:], -w2 * y[:, :1]))
+    return rhs
+
+
+def damped_rhs(k, m, b):
+    w2 = _column(k) / _column(m)
+    gamma = _column(b) / _column(m)
+
+    def rhs(t, y):
+        return np.hstack((y[:, 1:], -w2 * y[:, :1] - gamma * y[:, 1:]))
+    return rhs
+
+
+def pendulum_rhs(g, L):
+    w2 = _column(g) / _column(L)
+
+    def rhs(t, y):
+        return np.hstack((y[:, 1:], -w2 * np.sin(y[:, :1])))
+    return rhs
+
+
+def driven_pendulum_rhs(g, L, q, F, omega_d):
+    # simple pendulum.py with the damping of damped hosc.py (q = b/m) and a
+    # periodic drive: theta'' = -(g/L) sin(theta) - q theta' + F cos(omega_d t)
+    w2 = _column(g) / _column(L)
+    q, F, omega_d = _column(q), _column(F), _column(omega_d)
+
+    def rhs(t, y):
+        omega = y[:, 1:]
+        return np.hstack((omega, -w2 * np.sin(y[:, :1]) - q * omega + F * np.cos(omega_d * t)))
+    return rhs
+
+
+def rlc_rhs(R, L, C, V0, omega):
+    R, L, C = _column(R), _column(L), _column(C)
+    V0, omega = _column(V0), _column(omega)
+
+    def rhs(t, y):
+        V_t = V0 * np.cos(omega * t)  # External voltage at time t
+        Q, I = y[:, :1], y[:, 1:]
+        return np.hstack((I, (V_t - R * I - Q / C) / L))
+    return rhs
+
+
+def projectile_rhs(g, c, m, S=0.0, spin=0.0):
+    # State [x, y, vx, vy]: gravity, quadratic drag -(c/m)|v|v and the Magnus
+    # force S (omega x v) / m for a spin omega along z, as in projectile magnus.py
+    g = _column(g)
+    drag = _column(c) / _column(m)
+    magnus = _column(S) * _column(spin) / _column(m)
+
+    def rhs(t, y):
+        vx, vy = y[:, 2:3], y[:, 3:4]
+        speed = np.sqrt(vx**2 + vy**2)
+        ax = -drag * speed * vx - magnus * vy
+        ay = -g - drag * speed * vy + magnus * vx
+        return np.hstack((vx, vy, ax, ay))
+    return rhs
+
+
+def drag_fall_rhs(g, k, m, script_sign=False):
+    # Quadratic drag -(k/m)|v|v opposes the motion, so a falling body settles
+    # at the terminal velocity -sqrt(g m / k). script_sign=True reproduces the
+    # -(k/m) v**2 of free fall3.py instead, which pushes a falling body down
+    # harder and diverges after a couple of seconds; only for comparisons
+    # with that script.
+    g = _column(g)
+    drag = _column(k) / _column(m)
+
+    def rhs(t, y):
+        v = y[:, 1:]
+        if script_sign:
+            return np.hstack((v, -g - drag * v**2))
+        return np.hstack((v, -g - drag * np.abs(v) * v))
+    return rhs
+
+
+# Steppers for x'' = a(x) with the acceleration carried between steps, so the
+# symplectic schemes reuse the force evaluation from the end of the last step.
+# Each takes the positions x, velocities v (updated in place), the current
+# acceleration a = accel(x) and returns the acceleration at the new positions.
+
+def euler_accel_step(x, v, a, accel, dt):
+    x += v * dt
+    v += a * dt
+    return accel(x)
+
+
+def euler_cromer_accel_step(x, v, a, accel, dt):
+    v += a * dt
+    x += v * dt  # Use updated velocity
+    return accel(x)
+
+
+def verlet_step(x, v, a, accel, dt):
+    # Velocity Verlet (kick-drift-kick leapfrog), second order and symplectic
+    v += a * (0.5 * dt)
+    x += v * dt
+    a = accel(x)
+    v += a * (0.5 * dt)
+    return a
+
+
+_CBRT2 = 2.0 ** (1.0 / 3.0)
+YOSHIDA_WEIGHTS = (1.0 / (2.0 - _CBRT2), -_CBRT2 / (2.0 - _CBRT2), 1.0 / (2.0 - _CBRT2))
+
+
+def yoshida4_step(x, v, a, accel, dt):
+    # Yoshida's fourth-order composition of three Verlet substeps
+    for w in YOSHIDA_WEIGHTS:
+        a = verlet_step(x, v, a, accel, w * dt)
+    return a
+
+
+ACCEL_METHODS = {
+    'euler': euler_accel_step,
+    'euler-cromer': euler_cromer_accel_step,
+    'verlet': verlet_step,
+    'yoshida4': yoshida4_step,
+}
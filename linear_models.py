@@ -0,0 +1,57 @@
+import numpy as np
+
+# First-order linear relaxation dy/dt = -k (y - y_inf).
+#
+# absorption.py (k = mu, y_inf = 0), radioactivity.py (k = lambda_, y_inf = 0),
+# capacitor.py (k = 1/RC, y_inf = 0 or Vs) and the euler_method in newton.py
+# (y_inf = Ta) all step this equation. Every step multiplies y - y_inf by the
+# same constant, so the whole grid is y_inf + (y0 - y_inf) * a**n with the
+# one-step propagator a precomputed once.
+#
+# y0, y_inf and k may be arrays of parameter sets; they broadcast against each
+# other and the grid is laid out along the last axis.
+
+
+def propagator(k, dt, method='exact'):
+    k = np.asarray(k, dtype=float)
+    if method == 'exact':
+        return np.exp(-k * dt)
+    elif method == 'euler':
+        return 1.0 - k * dt
+    raise ValueError(f"unknown method {method!r}, expected 'exact' or 'euler'")
+
+
+def linear_solution(y0, y_inf, k, t):
+    # Evaluate the exact solution directly at any time(s) t
+    y0, y_inf, k = (np.asarray(p, dtype=float)[..., None] for p in (y0, y_inf, k))
+    return y_inf + (y0 - y_inf) * np.exp(-k * np.asarray(t, dtype=float))
+
+
+def solve_linear(y0, y_inf, k, dt, n, method='exact'):
+    # Fill n grid points t = 0, dt, ..., (n-1) dt in one vectorized operation
+    a = propagator(k, dt, method)[..., None]
+    y0, y_inf = (np.asarray(p, dtype=float)[..., None] for p in (y0, y_inf))
+    t_values = dt * np.arange(n)
+    return t_values, y_inf + (y0 - y_inf) * a ** np.arange(n)
+
+
+# Parameterisations used by the scripts
+
+def absorption(I0, mu, Z, n, method='exact'):
+    return solve_linear(I0, 0.0, mu, Z / n, n, method)
+
+
+def radioactive_decay(N0, lambda_, T, n, method='exact'):
+    return solve_linear(N0, 0.0, lambda_, T / n, n, method)
+
+
+def capacitor_discharge(V0, R, C, T, n, method='exact'):
+    return solve_linear(V0, 0.0, 1.0 / (np.asarray(R) * C), T / n, n, method)
+
+
+def capacitor_charge(Vs, R, C, T, n, method='exact'):
+    return solve_linear(0.0, Vs, 1.0 / (np.asarray(R) * C), T / n, n, method)
+
+
+def newton_cooling(T0, Ta, k, h, t_max, method='exact'):
+    return solve_linear(T0, Ta, k, h, int(t_max / h) + 1, method)
@@ -0,0 +1,226 @@
+import numpy as np
+
+from instrumentation import instrument
+
+# Charged particles in E and B fields, many particles at once.
+#
+# Positions and velocities are (N, 3) arrays. q and m may be scalars or one
+# value per particle, E and B are (3,) vectors or one vector per particle.
+# Defaults are the proton in project lorentz1.py.
+
+q_proton = 1.6e-19   # Charge (C)
+m_proton = 1.67e-27  # Mass of proton (kg)
+
+
+def _column(p):
+    p = np.asarray(p, dtype=float)
+    return p if p.ndim == 0 else p.reshape(-1, 1)
+
+
+def _cross(a, b, out):
+    # Row-wise a x b written into out without the temporaries of np.cross
+    out[:, 0] = a[:, 1] * b[:, 2] - a[:, 2] * b[:, 1]
+    out[:, 1] = a[:, 2] * b[:, 0] - a[:, 0] * b[:, 2]
+    out[:, 2] = a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+    return out
+
+
+@instrument.reports('force_evals')
+def lorentz_force(v, E, B, q=q_proton):
+    v = np.atleast_2d(v)
+    B = np.broadcast_to(np.asarray(B, dtype=float), v.shape)
+    return _column(q) * (E + _cross(v, B, np.empty(v.shape)))
+
+
+class BorisPusher:
+    # Boris rotation scheme: half electric kick, magnetic rotation, half
+    # electric kick, then drift. It conserves |v| exactly in a pure B field,
+    # so it stays stable at a dt where Euler-Cromer spirals outwards.
+    #
+    # It is a leapfrog: step() advances velocities that live half a step
+    # behind the positions, v(t - dt/2) -> v(t + dt/2). run() takes v0 at
+    # t = 0, rotates it back by dt/2 to start the leapfrog, and reports
+    # velocities brought forward by dt/2 to the position times, so positions
+    # and velocities are both second order.
+
+    def __init__(self, q, m, E, B, dt):
+        self.dt = dt
+        self.qm = _column(q) / _column(m)
+        self.E = np.asarray(E, dtype=float)
+        self.B = np.asarray(B, dtype=float)
+        self._n = None
+
+    def _coefficients(self, tau, shape):
+        # Electric half kick and rotation vectors t, s of a velocity update over tau
+        qm = self.qm * (0.5 * tau)
+        kick = np.broadcast_to(qm * self.E, shape).copy()
+        t = np.broadcast_to(qm * self.B, shape).copy()
+        s = 2.0 * t / (1.0 + np.sum(t**2, axis=1, keepdims=True))
+        return kick, t, s
+
+    def _prepare(self, n):
+        # Rotation vectors only depend on the fields, build them once per N
+        shape = (n, 3)
+        self.kick, self.t, self.s = self._coefficients(self.dt, shape)
+        self._half_back = self._coefficients(-0.5 * self.dt, shape)
+        self._half_forward = self._coefficients(0.5 * self.dt, shape)
+        self.v_prime = np.empty(shape)
+        self.tmp = np.empty(shape)
+        self._n = n
+
+    def _rotate(self, v, kick, t, s):
+        v += kick                                   # v- = v + qE tau/2m
+        np.add(v, _cross(v, t, self.tmp), out=self.v_prime)
+        v += _cross(self.v_prime, s, self.tmp)      # v+ = v- + v' x s
+        v += kick
+        return v
+
+    def step(self, r, v):
+        # v is the staggered velocity v(t - dt/2), r the position at t
+        if self._n != len(v):
+            self._prepare(len(v))
+        self._rotate(v, self.kick, self.t, self.s)
+        r += v * self.dt
+        return r, v
+
+    def synchronized(self, v):
+        # Velocity at the position time from the staggered v(t - dt/2)
+        return self._rotate(v.copy(), *self._half_forward)
+
+    def run(self, r0, v0, steps, record=True, sink=None, recorder=None):
+        # With a sink (e.g. trajectory_io.TrajectoryWriter) every position frame
+        # is streamed to it and only the final state is returned. A
+        # recorders.Recorder is handed the (r, v) state and returned instead.
+        r = np.array(r0, dtype=float, ndmin=2)
+        v = np.array(v0, dtype=float, ndmin=2)
+        r = np.broadcast_to(r, v.shape).copy()
+        v_start = v.copy()
+        if self._n != len(v):
+            self._prepare(len(v))
+        self._rotate(v, *self._half_back)  # v(-dt/2)
+        step = instrument.wrap(self.step, 'force_evals', 'step')
+        instrument.count('steps', steps - 1)
+        if recorder is not None:
+            recorder.begin(steps - 1, 0.0, (r, v_start))
+            keep = instrument.wrap(recorder, 'records', 'record')
+            for i in range(1, steps):
+                step(r, v)
+                keep(i, i * self.dt, (r, self.synchronized(v)))
+            return recorder
+        if sink is not None or not record:
+            if sink is not None:
+                append = instrument.wrap(sink.append, 'records', 'record')
+                append(r)
+            for _ in range(steps - 1):
+                step(r, v)
+                if sink is not None:
+                    append(r)
+            return r, (self.synchronized(v) if steps > 1 else v_start)
+
+        R = np.empty((steps,) + v.shape)
+        V = np.empty((steps,) + v.shape)
+        R[0], V[0] = r, v_start
+        for i in range(1, steps):
+            step(r, v)
+            R[i], V[i] = r, self.synchronized(v)
+        return R, V
+
+
+def simulate_lorentz(v0, method="boris", E=(0, 0, 500), B=(0, 0, 0.01),
+                     q=q_proton, m=m_proton, dt=1e-9, N=1000, r0=(0, 0, 0), record=True):
+    # Same contract as the scripts: N stored states starting at r0, v0. A
+    # single (3,) v0 returns (N, 3) arrays, an (n, 3) batch returns (N, n, 3).
+    # record=False only returns the final state, (3,) or (n, 3).
+    single = np.ndim(v0) == 1
+    if method == "boris":
+        r, v = BorisPusher(q, m, E, B, dt).run(r0, v0, N, record=record)
+    elif method in ("euler", "euler-cromer"):
+        v_now = np.array(v0, dtype=float, ndmin=2)
+        r_now = np.broadcast_to(np.asarray(r0, dtype=float), v_now.shape).copy()
+        E = np.asarray(E, dtype=float)
+        qm = _column(q) / _column(m)
+        Bb = np.broadcast_to(np.asarray(B, dtype=float), v_now.shape)
+        cross = np.empty(v_now.shape)
+        if record:
+            r = np.empty((N,) + v_now.shape)
+            v = np.empty((N,) + v_now.shape)
+            r[0], v[0] = r_now, v_now
+        instrument.count('force_evals', N - 1)
+        instrument.count('steps', N - 1)
+        with instrument.phase('step'):
+            for i in range(1, N):
+                a = qm * (E + _cross(v_now, Bb, cross))
+                if method == "euler":
+                    r_now += v_now * dt
+                    v_now += a * dt
+                else:
+                    v_now += a * dt
+                    r_now += v_now * dt
+                if record:
+                    r[i], v[i] = r_now, v_now
+        if not record:
+            r, v = r_now, v_now
+    else:
+        raise ValueError(f"unknown method {method!r}, expected 'euler', 'euler-cromer' or 'boris'")
+
+    if single:
+        return (r[:, 0], v[:, 0]) if record else (r[0], v[0])
+    return r, v
+
+
+def gyro_motion(r0, v0, t, q=q_proton, m=m_proton, E=(0, 0, 500), B=(0, 0, 0.01)):
+    # Exact motion in uniform fields: uniform acceleration along B, E x B
+    # drift across it and a gyration about B at the cyclotron frequency.
+    # Evaluated at every time in t at once, with no time stepping. Output
+    # shapes follow simulate_lorentz: (len(t), 3) or (len(t), n, 3).
+    single = np.ndim(v0) == 1
+    v0 = np.array(v0, dtype=float, ndmin=2)
+    r0 = np.broadcast_to(np.asarray(r0, dtype=float), v0.shape)
+    E = np.broadcast_to(np.asarray(E, dtype=float), v0.shape)
+    B = np.broadcast_to(np.asarray(B, dtype=float), v0.shape)
+    qm = _column(q) / _column(m)
+
+    B_mag = np.linalg.norm(B, axis=1, keepdims=True)
+    # Without B the motion is pure acceleration along E, so take b along E
+    E_mag = np.linalg.norm(E, axis=1, keepdims=True)
+    fallback = np.where(E_mag > 0, E / np.where(E_mag > 0, E_mag, 1.0), [0.0, 0.0, 1.0])
+    b = np.where(B_mag > 0, B / np.where(B_mag > 0, B_mag, 1.0), fallback)
+    omega = np.broadcast_to(qm * B_mag, B_mag.shape)  # Signed cyclotron frequency
+
+    E_par = np.sum(E * b, axis=1, keepdims=True) * b
+    v_drift = _cross(E, B, np.empty(v0.shape)) / np.where(B_mag > 0, B_mag**2, 1.0)
+    v_par0 = np.sum(v0 * b, axis=1, keepdims=True) * b
+    u0 = v0 - v_par0 - v_drift  # Gyration velocity in the drift frame
+    bxu0 = _cross(b, u0, np.empty(v0.shape))
+
+    t = np.asarray(t, dtype=float).reshape(-1, 1, 1)
+    phase = omega * t
+    cos, sin = np.cos(phase), np.sin(phase)
+    safe = np.where(omega != 0, omega, 1.0)
+    sin_over = np.where(omega != 0, sin / safe, t)          # sin(wt)/w -> t
+    cos_over = np.where(omega != 0, (1.0 - cos) / safe, 0)  # (1-cos(wt))/w -> 0
+
+    a_par = qm * E_par
+    v = v_par0 + a_par * t + v_drift + u0 * cos - bxu0 * sin
+    r = (r0 + (v_par0 + v_drift) * t + 0.5 * a_par * t**2
+         + u0 * sin_over - bxu0 * cos_over)
+    if single:
+        return r[:, 0], v[:, 0]
+    return r, v
+
+
+def pusher_divergence(v0, methods=("euler", "euler-cromer", "boris"), r0=(0, 0, 0),
+                      q=q_proton, m=m_proton, E=(0, 0, 500), B=(0, 0, 0.01),
+                      dt=1e-9, N=1000):
+    # Largest position and velocity error of each numerical pusher against
+    # gyro_motion over the same N stored states
+    t = dt * np.arange(N)
+    r_exact, v_exact = gyro_motion(r0, v0, t, q=q, m=m, E=E, B=B)
+    errors = {}
+    for method in methods:
+        r, v = simulate_lorentz(v0, method, E=E, B=B, q=q, m=m, dt=dt, N=N, r0=r0)
+        errors[method] = {
+            "max_position_error": np.max(np.linalg.norm(r - r_exact, axis=-1)),
+            "max_velocity_error": np.max(np.linalg.norm(v - v_exact, axis=-1)),
+        }
+    return errors
@@ -0,0 +1,156 @@
+import numpy as np
+
+from barnes_hut import barnes_hut_accelerations
+from instrumentation import instrument
+from integrators import ACCEL_METHODS
+
+# N-body gravity on contiguous arrays.
+#
+# Positions and velocities are (N, dim) arrays, masses an (N,) array, with
+# dim = 2 (as in the star-planet scripts) or 3. Default units are AU, years
+# and solar masses as in exc  sun planet.py, so G = 4 pi^2.
+
+G_AU = 4 * np.pi**2  # Gravitational constant in AU^3 / (yr^2 * solar mass)
+
+BLOCK_BYTES = 32 * 2**20  # Budget for the (block, N, dim) separations of direct_accelerations
+
+
+def direct_accelerations(pos, mass, G=G_AU, softening=0.0, block=None):
+    # All pairwise accelerations in one vectorized pass. Rows are processed in
+    # blocks so the (block, N, dim) separation array stays within BLOCK_BYTES
+    # whatever N is; block overrides the number of rows.
+    n = len(pos)
+    if block is None:
+        block = max(1, BLOCK_BYTES // (n * pos.shape[1] * pos.itemsize))
+    acc = np.empty_like(pos)
+    eps2 = softening**2
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        dr = pos[None, :, :] - pos[start:stop, None, :]  # r_j - r_i
+        r2 = np.einsum('ijk,ijk->ij', dr, dr) + eps2
+        rows = np.arange(stop - start)
+        r2[rows, rows + start] = np.inf  # No self-interaction
+        inv_r3 = r2**-1.5
+        acc[start:stop] = G * np.einsum('ij,ijk->ik', inv_r3 * mass, dr)
+    return acc
+
+
+FORCES = {
+    'direct': direct_accelerations,
+    'barnes-hut': barnes_hut_accelerations,
+}
+
+
+def circular_velocity(M, r, G=G_AU):
+    # Speed of a circular orbit of radius r around a mass M
+    return np.sqrt(G * M / r)
+
+
+class NBodySystem:
+
+    def __init__(self, pos, vel, mass, G=G_AU, softening=0.0, force='direct', names=None,
+                 **force_options):
+        # force_options go to the force backend, e.g. theta for 'barnes-hut'
+        self.pos = np.ascontiguousarray(pos, dtype=float)
+        self.vel = np.ascontiguousarray(vel, dtype=float)
+        self.mass = np.ascontiguousarray(mass, dtype=float)
+        if self.pos.shape != self.vel.shape or self.pos.shape[0] != self.mass.shape[0]:
+            raise ValueError("pos and vel must be (N, dim) and mass (N,)")
+        if force not in FORCES:
+            raise ValueError(f"unknown force {force!r}, expected one of {sorted(FORCES)}")
+        self.G = G
+        self.softening = softening
+        self.force = force
+        self.force_options = force_options
+        self.names = list(names) if names is not None else None
+        self.t = 0.0
+        self._acc = None  # Acceleration at the current positions
+
+    @classmethod
+    def from_bodies(cls, bodies, **kwargs):
+        # bodies: iterable of dicts with 'mass', 'position', 'velocity' and an
+        # optional 'name', e.g. a star, its planets and their moons
+        bodies = list(bodies)
+        return cls([b['position'] for b in bodies],
+                   [b['velocity'] for b in bodies],
+                   [b['mass'] for b in bodies],
+                   names=[b.get('name', str(i)) for i, b in enumerate(bodies)],
+                   **kwargs)
+
+    def __len__(self):
+        return len(self.mass)
+
+    def accelerations(self, pos=None):
+        pos = self.pos if pos is None else pos
+        return FORCES[self.force](pos, self.mass, G=self.G, softening=self.softening,
+                                  **self.force_options)
+
+    def step(self, dt, method='euler-cromer'):
+        # method is any of integrators.ACCEL_METHODS: 'euler', 'euler-cromer',
+        # 'verlet' or 'yoshida4'
+        if method not in ACCEL_METHODS:
+            raise ValueError(f"unknown method {method!r}, expected one of {sorted(ACCEL_METHODS)}")
+        accel = instrument.wrap(self.accelerations, 'force_evals', 'force')
+        if self._acc is None:
+            self._acc = accel()
+        self._acc = ACCEL_METHODS[method](self.pos, self.vel, self._acc, accel, dt)
+        instrument.count('steps')
+        self.t += dt
+
+    def run(self, dt, steps, method='euler-cromer', record=True, sink=None, recorder=None):
+        # With a sink (e.g. trajectory_io.TrajectoryWriter) every position frame
+        # is streamed to it and only the final positions are returned. A
+        # recorders.Recorder is handed the (pos, vel) state and returned instead.
+        self._acc = None  # Positions may have been edited since the last step
+        if recorder is not None:
+            recorder.begin(steps, self.t, (self.pos, self.vel))
+            keep = instrument.wrap(recorder, 'records', 'record')
+            for n in range(steps):
+                self.step(dt, method)
+                keep(n + 1, self.t, (self.pos, self.vel))
+            return recorder
+        if sink is not None or not record:
+            if sink is not None:
+                append = instrument.wrap(sink.append, 'records', 'record')
+                append(self.pos)
+            for _ in range(steps):
+                self.step(dt, method)
+                if sink is not None:
+                    append(self.pos)
+            return self.pos
+        trajectory = np.empty((steps + 1,) + self.pos.shape)
+        trajectory[0] = self.pos
+        for n in range(steps):
+            self.step(dt, method)
+            trajectory[n+1] = self.pos
+        return trajectory
+
+    # Conserved quantities
+
+    def kinetic_energy(self):
+        return 0.5 * np.sum(self.mass * np.sum(self.vel**2, axis=1))
+
+    def potential_energy(self):
+        U = 0.0
+        for i in range(len(self) - 1):
+            dr = self.pos[i+1:] - self.pos[i]
+            r = np.sqrt(np.sum(dr**2, axis=1) + self.softening**2)
+            U -= self.G * self.mass[i] * np.sum(self.mass[i+1:] / r)
+        return U
+
+    def energy(self):
+        return self.kinetic_energy() + self.potential_energy()
+
+    def momentum(self):
+        return np.sum(self.mass[:, None] * self.vel, axis=0)
+
+    def angular_momentum(self):
+        if self.pos.shape[1] == 2:
+            return np.sum(self.mass * (self.pos[:, 0] * self.vel[:, 1] - self.pos[:, 1] * self.vel[:, 0]))
+        return np.sum(self.mass[:, None] * np.cross(self.pos, self.vel), axis=0)
+
+    def to_center_of_mass(self):
+        # Remove the centre-of-mass position and drift so the system stays put
+        M = np.sum(self.mass)
+        self.pos -= np.sum(self.mass[:, None] * self.pos, axis=0) / M
+        self.vel -= self.momentum() / M
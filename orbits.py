@@ -0,0 +1,151 @@
+import numpy as np
+
+from adaptive import dopri45
+from instrumentation import instrument
+from integrators import ACCEL_METHODS
+
+# A planet around a fixed star, as in exc  sun planet.py, with the symplectic
+# steppers next to Euler and Euler-Cromer. Several initial velocities can run
+# side by side as batch lanes.
+
+# Constants
+G = 4 * np.pi**2       # Gravitational constant in AU^3 / (yr^2 * solar mass)
+M = 1.0                # Mass of Sun (solar mass)
+m = 3e-6               # Mass of planet (Earth ~ 3e-6 solar masses)
+
+
+def kepler_acceleration(G=G, M=M):
+    GM = G * M
+
+    def accel(r):
+        r2 = np.sum(r**2, axis=-1, keepdims=True)
+        return -GM * r / (r2 * np.sqrt(r2))
+    return accel
+
+
+def orbit_energy(r, v, G=G, M=M, m=m):
+    K = 0.5 * m * np.sum(v**2, axis=-1)
+    U = -G * M * m / np.sqrt(np.sum(r**2, axis=-1))
+    return K + U
+
+
+def orbit_angular_momentum(r, v, m=m):
+    return m * (r[..., 0] * v[..., 1] - r[..., 1] * v[..., 0])
+
+
+def _initial_state(vx0):
+    # 1 AU from the Sun, moving along y; vx0 keeps the script's name
+    vx0 = np.atleast_1d(np.asarray(vx0, dtype=float))
+    r = np.zeros((len(vx0), 2))
+    r[:, 0] = 1.0
+    v = np.zeros((len(vx0), 2))
+    v[:, 1] = vx0
+    return r, v
+
+
+def simulate_orbit(method='euler', vx0=0.0, dt=0.001, T=1.0, G=G, M=M, m=m,
+                   rtol=1e-8, atol=1e-10, record=True):
+    # method: 'euler', 'euler-cromer', 'verlet', 'yoshida4' or the adaptive
+    # 'rk45', which steps on its own and is sampled on the dt grid through its
+    # dense output (rtol and atol only apply to 'rk45'). record=False returns
+    # only the final x, y and energy of the stepped methods.
+    if method == 'rk45':
+        return _simulate_orbit_rk45(vx0, dt, T, G, M, m, rtol, atol)
+    if method not in ACCEL_METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {sorted(ACCEL_METHODS)}")
+    step = ACCEL_METHODS[method]
+    accel = instrument.wrap(kepler_acceleration(G, M), 'force_evals', 'force')
+    N = int(round(T / dt))  # Number of steps
+    instrument.count('steps', N)
+
+    single = np.ndim(vx0) == 0
+    r, v = _initial_state(vx0)
+    a = accel(r)
+    if not record:
+        for n in range(N):
+            a = step(r, v, a, accel, dt)
+        energy = orbit_energy(r, v, G, M, m)
+        if single:
+            return r[0, 0], r[0, 1], energy[0]
+        return r[:, 0], r[:, 1], energy
+
+    traj = np.empty((N + 1,) + r.shape)
+    energy = np.empty((N, len(r)))
+    traj[0] = r
+    for n in range(N):
+        a = step(r, v, a, accel, dt)
+        traj[n+1] = r
+        energy[n] = orbit_energy(r, v, G, M, m)
+
+    if single:
+        return traj[:, 0, 0], traj[:, 0, 1], energy[:, 0]
+    return traj[..., 0], traj[..., 1], energy
+
+
+def orbit_rhs(G=G, M=M):
+    # First-order form for the adaptive solver, state = [x, y, vx, vy]
+    accel = kepler_acceleration(G, M)
+
+    def rhs(t, s):
+        return np.concatenate((s[2:], accel(s[:2])))
+    return rhs
+
+
+def simulate_orbit_adaptive(vx0=0.0, T=1.0, rtol=1e-8, atol=1e-10, G=G, M=M):
+    # Dormand-Prince RK45 with step-size control: small steps at perihelion,
+    # large ones far from the Sun. The result holds the accepted steps, the
+    # step statistics (n_eval, n_accept, n_reject) and is callable at any t.
+    return dopri45(orbit_rhs(G, M), (0.0, T), [1.0, 0.0, 0.0, vx0], rtol=rtol, atol=atol)
+
+
+def _simulate_orbit_rk45(vx0, dt, T, G, M, m, rtol, atol):
+    N = int(round(T / dt))
+    t = dt * np.arange(N + 1)
+    lanes = []
+    for v in np.atleast_1d(vx0):
+        s = simulate_orbit_adaptive(v, T, rtol, atol, G, M)(t)
+        lanes.append(s)
+    s = np.stack(lanes, axis=1)  # (N + 1, batch, 4)
+    energy = orbit_energy(s[1:, :, :2], s[1:, :, 2:], G, M, m)
+    if np.ndim(vx0) == 0:
+        return s[:, 0, 0], s[:, 0, 1], energy[:, 0]
+    return s[..., 0], s[..., 1], energy
+
+
+def orbital_period(vx0, G=G, M=M):
+    # Kepler period from the vis-viva semi-major axis; inf for unbound orbits
+    vx0 = np.asarray(vx0, dtype=float)
+    inv_a = 2.0 - vx0**2 / (G * M)  # r0 = 1 AU
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(inv_a > 0, 2 * np.pi * np.sqrt(inv_a**-3 / (G * M)), np.inf)
+
+
+def long_run(method='yoshida4', vx0=2 * np.pi, n_orbits=10**6, steps_per_orbit=100,
+             sample_every=1, G=G, M=M, m=m):
+    # Integrate n_orbits bound orbits without storing trajectories, sampling the
+    # relative energy and angular momentum drift every sample_every orbits.
+    # Each lane uses its own dt = period / steps_per_orbit.
+    step = ACCEL_METHODS[method]
+    accel = instrument.wrap(kepler_acceleration(G, M), 'force_evals', 'force')
+    r, v = _initial_state(vx0)
+    period = np.atleast_1d(orbital_period(v[:, 1], G, M))
+    if not np.all(np.isfinite(period)):
+        raise ValueError("long_run needs bound orbits (vx0 below escape speed)")
+    dt = (period / steps_per_orbit)[:, None]
+
+    E0 = orbit_energy(r, v, G, M, m)
+    L0 = orbit_angular_momentum(r, v, m)
+    samples = n_orbits // sample_every
+    orbit = np.arange(1, samples + 1) * sample_every
+    energy_drift = np.empty((samples, len(r)))
+    L_drift = np.empty((samples, len(r)))
+
+    instrument.count('steps', samples * sample_every * steps_per_orbit)
+    a = accel(r)
+    for s in range(samples):
+        for _ in range(sample_every * steps_per_orbit):
+            a = step(r, v, a, accel, dt)
+        energy_drift[s] = orbit_energy(r, v, G, M, m) / E0 - 1
+        L_drift[s] = orbit_angular_momentum(r, v, m) / L0 - 1
+
+    return {'orbit': orbit, 'energy_drift': energy_drift, 'angular_momentum_drift': L_drift}
@@ -0,0 +1,258 @@
+import numpy as np
+
+from instrumentation import instrument
+from integrators import ACCEL_METHODS
+
+# Networks of masses joined by springs, from the two-mass chain of
+# coupled osc 1dim.py up to chains of millions of masses.
+#
+# A network is an edge list: spring e joins mass i[e] to mass j[e] with
+# stiffness k[e]; either end may instead be a fixed wall, WALL. The stretch
+# of a spring is x[j] - x[i], so a wall to the left of a mass is i = WALL
+# and one to its right is j = WALL. Displacements x are measured from
+# equilibrium, so a linear network obeys M x'' = -K x with the
+# sparse stiffness matrix K. Optional quadratic and cubic terms k2, k3 make
+# the spring force f(s) = k s + k2 s^2 + k3 s^3 of the stretch s (a
+# Fermi-Pasta-Ulam chain); those networks can only be stepped.
+#
+# Linear networks also have an exact path: the normal modes of M^-1 K are
+# computed once, from the symmetric M^-1/2 K M^-1/2, cached, and the state
+# at any time is a sum of harmonic modes. Uniform chains between two walls
+# use the known sine modes and a fast sine transform instead of a dense
+# eigendecomposition, so they scale to 10^6 masses.
+
+WALL = -1
+
+
+class CSRMatrix:
+    # Compressed sparse rows: row r holds data[indptr[r]:indptr[r+1]] in the
+    # columns indices[indptr[r]:indptr[r+1]]
+
+    def __init__(self, indptr, indices, data, shape):
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+        self.data = np.asarray(data, dtype=float)
+        self.shape = shape
+        self._rows = np.repeat(np.arange(shape[0]), np.diff(self.indptr))
+
+    @classmethod
+    def from_coo(cls, rows, cols, data, shape):
+        # Duplicate (row, col) entries are summed
+        rows, cols = np.asarray(rows), np.asarray(cols)
+        key = rows.astype(np.int64) * shape[1] + cols
+        unique, inverse = np.unique(key, return_inverse=True)
+        summed = np.bincount(inverse, weights=np.broadcast_to(data, key.shape),
+                             minlength=len(unique))
+        rows, cols = np.divmod(unique, shape[1])
+        indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+        return cls(indptr, cols, summed, shape)
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def __matmul__(self, x):
+        # x is (n,) or (n, batch)
+        products = self.data.reshape((-1,) + (1,) * (x.ndim - 1)) * x[self.indices]
+        if x.ndim == 1:
+            return np.bincount(self._rows, weights=products, minlength=self.shape[0])
+        out = np.zeros((self.shape[0],) + x.shape[1:])
+        filled = np.diff(self.indptr) > 0
+        if self.nnz:
+            out[filled] = np.add.reduceat(products, self.indptr[:-1][filled], axis=0)
+        return out
+
+    def diagonal(self):
+        d = np.zeros(min(self.shape))
+        on = self._rows == self.indices
+        d[self._rows[on]] = self.data[on]
+        return d
+
+    def toarray(self):
+        dense = np.zeros(self.shape)
+        dense[self._rows, self.indices] = self.data
+        return dense
+
+
+def _dst1(y):
+    # Orthonormal type-I discrete sine transform along axis 0 (its own
+    # inverse), through an FFT of the odd extension: O(n log n)
+    n = len(y)
+    z = np.zeros((2 * (n + 1),) + y.shape[1:])
+    z[1:n+1] = y
+    z[n+2:] = -y[::-1]
+    return -np.fft.rfft(z, axis=0)[1:n+1].imag * np.sqrt(0.5 / (n + 1))
+
+
+class NormalModes:
+    # x(t) = M^-1/2 Phi q(t) with q_n(t) = q_n cos(w_n t) + p_n / w_n sin(w_n t)
+    # (q_n + p_n t for zero modes). Phi is a dense matrix, or None for the
+    # sine modes of a uniform chain, which go through _dst1.
+
+    def __init__(self, omega, vectors, mass):
+        self.omega = omega
+        self.vectors = vectors
+        self.sqrt_m = np.sqrt(mass)
+
+    @classmethod
+    def from_stiffness(cls, K, mass):
+        # Dense eigendecomposition of the symmetric M^-1/2 K M^-1/2
+        inv_sqrt_m = 1.0 / np.sqrt(mass)
+        w2, vectors = np.linalg.eigh(inv_sqrt_m[:, None] * K.toarray() * inv_sqrt_m)
+        return cls(np.sqrt(np.clip(w2, 0.0, None)), vectors, mass)
+
+    @classmethod
+    def uniform_chain(cls, n, k, mass):
+        # Walls at both ends: w_n = 2 sqrt(k/m) sin(n pi / (2 (N + 1)))
+        w = 2 * np.sqrt(k / mass) * np.sin(np.arange(1, n + 1) * np.pi / (2 * (n + 1)))
+        return cls(w, None, np.full(n, float(mass)))
+
+    def _to_modes(self, x):
+        y = self.sqrt_m.reshape((-1,) + (1,) * (x.ndim - 1)) * x
+        return _dst1(y) if self.vectors is None else self.vectors.T @ y
+
+    def _from_modes(self, q):
+        y = _dst1(q) if self.vectors is None else self.vectors @ q
+        return y / self.sqrt_m.reshape((-1,) + (1,) * (q.ndim - 1))
+
+    def project(self, x0, v0):
+        # Modal amplitudes of an initial state
+        return self._to_modes(np.asarray(x0, dtype=float)), self._to_modes(np.asarray(v0, dtype=float))
+
+    def evaluate(self, t, q0, p0):
+        # Positions and velocities at time(s) t, shape (len(t), n) or
+        # (len(t), n, batch) for an array t
+        t = np.asarray(t, dtype=float)
+        w = self.omega.reshape((-1,) + (1,) * (np.ndim(q0) - 1))
+        moving = w > 0
+        w_safe = np.where(moving, w, 1.0)
+        frames = []
+        for ti in np.atleast_1d(t):
+            c, s = np.cos(w * ti), np.sin(w * ti)
+            q = q0 * c + p0 * np.where(moving, s / w_safe, ti)
+            p = -q0 * w * s + p0 * c
+            frames.append((self._from_modes(q), self._from_modes(p)))
+        if t.ndim == 0:
+            return frames[0]
+        return np.array([f[0] for f in frames]), np.array([f[1] for f in frames])
+
+
+class OscillatorNetwork:
+
+    def __init__(self, mass, i, j, k, k2=0.0, k3=0.0):
+        self.mass = np.asarray(mass, dtype=float)
+        n = len(self.mass)
+        self.i = np.asarray(i, dtype=np.int64)
+        self.j = np.asarray(j, dtype=np.int64)
+        self.k = np.broadcast_to(np.asarray(k, dtype=float), self.i.shape).copy()
+        self.k2 = np.broadcast_to(np.asarray(k2, dtype=float), self.i.shape).copy()
+        self.k3 = np.broadcast_to(np.asarray(k3, dtype=float), self.i.shape).copy()
+        if np.any((self.i < WALL) | (self.i >= n) | (self.j < WALL) | (self.j >= n)
+                  | ((self.i == WALL) & (self.j == WALL))):
+            raise ValueError("spring ends must be mass indices or WALL, at most one WALL per spring")
+        self.linear = not (self.k2.any() or self.k3.any())
+        self._wall_i = self.i == WALL
+        self._wall_j = self.j == WALL
+        self._modes = None
+
+        # K = sum over springs of k (e_i - e_j)(e_i - e_j)^T, with e_WALL = 0:
+        # a wall spring only adds k to the diagonal of its mass
+        inner = ~(self._wall_i | self._wall_j)
+        ends = np.where(self._wall_i, self.j, self.i)  # The moving end of wall springs
+        ii, jj, kk = self.i[inner], self.j[inner], self.k[inner]
+        rows = np.concatenate((ends, self.j[inner], ii, jj))
+        cols = np.concatenate((ends, self.j[inner], jj, ii))
+        data = np.concatenate((self.k, kk, -kk, -kk))
+        self.stiffness = CSRMatrix.from_coo(rows, cols, data, (n, n))
+
+        # Edge -> mass incidence (+1 at i, -1 at j, nothing at a wall) scatters
+        # spring forces
+        edges = np.arange(len(self.i))
+        has_i, has_j = ~self._wall_i, ~self._wall_j
+        self._incidence = CSRMatrix.from_coo(
+            np.concatenate((self.i[has_i], self.j[has_j])),
+            np.concatenate((edges[has_i], edges[has_j])),
+            np.concatenate((np.ones(has_i.sum()), -np.ones(has_j.sum()))), (n, len(edges)))
+
+    @classmethod
+    def chain(cls, n, k=10.0, mass=1.0, walls=(True, True), k2=0.0, k3=0.0):
+        # n masses in a row, spring e joining mass e to e + 1, plus a spring to
+        # a wall at each end where walls says so. k and mass may be per spring
+        # and per mass.
+        i = np.arange(n - 1)
+        j = i + 1
+        k = np.broadcast_to(np.asarray(k, dtype=float), (n - 1 + sum(walls),))
+        if walls[0]:
+            i, j = np.append(WALL, i), np.append(0, j)
+        if walls[1]:
+            i, j = np.append(i, n - 1), np.append(j, WALL)
+        network = cls(np.broadcast_to(np.asarray(mass, dtype=float), (n,)), i, j, k, k2, k3)
+        network._uniform_chain = (all(walls) and np.all(network.k == network.k[0])
+                                  and np.all(network.mass == network.mass[0]))
+        return network
+
+    def __len__(self):
+        return len(self.mass)
+
+    def stretch(self, x):
+        # Stretch of every spring, x[j] - x[i] (a wall does not move)
+        column = (-1,) + (1,) * (x.ndim - 1)
+        xi = np.where(self._wall_i.reshape(column), 0.0, x[np.where(self._wall_i, 0, self.i)])
+        xj = np.where(self._wall_j.reshape(column), 0.0, x[np.where(self._wall_j, 0, self.j)])
+        return xj - xi
+
+    def accelerations(self, x):
+        # x is (n,) or (n, batch): the sparse mat-vec -K x / m when linear,
+        # otherwise spring forces f(s) scattered onto the masses
+        column = (-1,) + (1,) * (x.ndim - 1)
+        if self.linear:
+            return -(self.stiffness @ x) / self.mass.reshape(column)
+        s = self.stretch(x)
+        k, k2, k3 = (c.reshape(column) for c in (self.k, self.k2, self.k3))
+        f = s * (k + s * (k2 + s * k3))
+        return (self._incidence @ f) / self.mass.reshape(column)
+
+    def energy(self, x, v):
+        s = self.stretch(x)
+        column = (-1,) + (1,) * (x.ndim - 1)
+        k, k2, k3 = (c.reshape(column) for c in (self.k, self.k2, self.k3))
+        U = np.sum(s**2 * (k / 2 + s * (k2 / 3 + s * k3 / 4)), axis=0)
+        return 0.5 * np.sum(self.mass.reshape(column) * v**2, axis=0) + U
+
+    def simulate(self, x0, v0, dt, steps, method='verlet', every=1):
+        # Step with integrators.ACCEL_METHODS; returns times and positions and
+        # velocities every `every` steps, each (samples, n) or (samples, n, batch)
+        if method not in ACCEL_METHODS:
+            raise ValueError(f"unknown method {method!r}, expected one of {sorted(ACCEL_METHODS)}")
+        step = ACCEL_METHODS[method]
+        accel = instrument.wrap(self.accelerations, 'force_evals', 'force')
+        instrument.count('steps', steps)
+        x = np.array(x0, dtype=float)
+        v = np.array(v0, dtype=float)
+        samples = steps // every + 1
+        X = np.empty((samples,) + x.shape)
+        V = np.empty((samples,) + x.shape)
+        X[0], V[0] = x, v
+        a = accel(x)
+        for n in range(1, steps + 1):
+            a = step(x, v, a, accel, dt)
+            if n % every == 0:
+                X[n // every], V[n // every] = x, v
+        return dt * every * np.arange(samples), X, V
+
+    def modes(self):
+        # Normal modes, computed on first use and cached
+        if not self.linear:
+            raise ValueError("normal modes need linear springs (k2 = k3 = 0)")
+        if self._modes is None:
+            if getattr(self, '_uniform_chain', False):
+                self._modes = NormalModes.uniform_chain(len(self), self.k[0], self.mass[0])
+            else:
+                self._modes = NormalModes.from_stiffness(self.stiffness, self.mass)
+        return self._modes
+
+    def state(self, t, x0, v0):
+        # Exact positions and velocities at time(s) t without stepping
+        modes = self.modes()
+        return modes.evaluate(t, *modes.project(x0, v0))
@@ -0,0 +1,151 @@
+import functools
+
+import numpy as np
+
+from instrumentation import instrument
+from integrators import ACCEL_METHODS
+
+# Large-amplitude pendulum theta'' = -(g/L) sin(theta), for whole tables of
+# amplitudes, lengths and gravities at once.
+#
+# Released from rest at theta0 the motion is known in closed form. With
+# k = sin(theta0 / 2), kc = cos(theta0 / 2), m = k^2 and w0 = sqrt(g / L):
+#
+#   period    T = 4 K(m) / w0
+#   angle     theta(t) = 2 arcsin(k cd(w0 t | m))
+#   velocity  omega(t) = -2 k kc w0 sd(w0 t | m)
+#
+# The complete elliptic integral K and the Jacobi functions sn, cn, dn are
+# computed with the arithmetic-geometric mean and descending Landen
+# transformations, vectorized over any array of parameters. period() uses a
+# cached interpolation table of T / T_small for speed; simulate() steps the
+# same batches with the integrators for comparison with the scripts.
+
+# Parameters
+g = 9.8  # Gravity (m/s^2)
+L = 1.0  # Length of pendulum (m)
+
+AGM_TOL = 1e-15
+
+
+def _agm_steps(kc):
+    # Successive (a_n, c_n) of the AGM of 1 and the complementary modulus
+    # kc = sqrt(1 - m) until every c_n is below AGM_TOL
+    a = np.ones_like(kc)
+    b = kc
+    c = np.sqrt((1.0 - kc) * (1.0 + kc))
+    steps = [(a, c)]
+    while np.any(np.abs(c) > AGM_TOL * a):
+        a, b, c = (a + b) / 2, np.sqrt(a * b), (a - b) / 2
+        steps.append((a, c))
+    return steps
+
+
+def _ellipk(kc):
+    # K from the complementary modulus, which keeps its accuracy as m -> 1
+    a, _ = _agm_steps(kc)[-1]
+    return np.pi / (2 * a)
+
+
+def ellipk(m):
+    # Complete elliptic integral of the first kind K(m), m = k^2 < 1
+    m = np.asarray(m, dtype=float)
+    if np.any((m < 0) | (m >= 1)):
+        raise ValueError("ellipk needs 0 <= m < 1")
+    return _ellipk(np.sqrt(1.0 - m))
+
+
+def ellipj(u, m):
+    # Jacobi elliptic functions sn, cn, dn of u for parameter m, by descending
+    # Landen transformations (Abramowitz & Stegun 16.4). The AGM only depends
+    # on m, so it runs on m's own shape and broadcasts against u.
+    u = np.asarray(u, dtype=float)
+    m = np.asarray(m, dtype=float)
+    if np.any((m < 0) | (m >= 1)):
+        raise ValueError("ellipj needs 0 <= m < 1")
+    steps = _agm_steps(np.sqrt(1.0 - m))
+    n = len(steps) - 1
+    a_n, _ = steps[-1]
+    phi = 2.0**n * a_n * u
+    for a, c in reversed(steps[1:]):
+        phi = (phi + np.arcsin(np.clip(c / a * np.sin(phi), -1.0, 1.0))) / 2
+    sn, cn = np.sin(phi), np.cos(phi)
+    return sn, cn, np.sqrt(1.0 - m * sn**2)
+
+
+def _modulus(theta0):
+    # k = sin(theta0/2) and kc = cos(theta0/2)
+    theta0 = np.abs(np.asarray(theta0, dtype=float))
+    if np.any(theta0 >= np.pi):
+        raise ValueError("amplitudes must be below pi (the pendulum must swing, not rotate)")
+    return np.sin(theta0 / 2), np.cos(theta0 / 2)
+
+
+def exact_period(theta0, g=g, L=L):
+    # 4 sqrt(L/g) K(sin^2(theta0/2)), evaluated directly
+    return 4 * np.sqrt(np.asarray(L) / np.asarray(g)) * _ellipk(_modulus(theta0)[1])
+
+
+# The period factor T / (2 pi sqrt(L/g)) = 2 K / pi grows like log(1/cos(theta0/2))
+# towards theta0 = pi, so the table uses s = -log(cos(theta0/2)), in which the
+# factor is smooth and nearly linear at the far end
+
+@functools.lru_cache(maxsize=None)
+def period_table(size=65536, s_max=20.0):
+    s = np.linspace(0.0, s_max, size)
+    return s, 2 * _ellipk(np.exp(-s)) / np.pi
+
+
+def period(theta0, g=g, L=L):
+    # Exact period through the cached table; amplitudes closer to pi than the
+    # table reaches fall back to the direct AGM evaluation
+    s_table, factor = period_table()
+    s = -np.log(_modulus(theta0)[1])
+    T = np.interp(s, s_table, factor) * 2 * np.pi * np.sqrt(np.asarray(L) / np.asarray(g))
+    far = s > s_table[-1]
+    if np.any(far):
+        T = np.where(far, exact_period(theta0, g, L), T)
+    return T
+
+
+def trajectory(t, theta0, g=g, L=L):
+    # Closed-form angle and angular velocity of pendulums released from rest.
+    # Parameters broadcast against each other; an array t is laid out along
+    # the last axis, as in linear_models.py.
+    k, kc = _modulus(theta0)
+    sign = np.sign(theta0)
+    w0 = np.sqrt(np.asarray(g, dtype=float) / np.asarray(L, dtype=float))
+    k, kc, sign, w0 = np.broadcast_arrays(k, kc, sign, w0)
+    t = np.asarray(t, dtype=float)
+    if t.ndim:
+        k, kc, sign, w0 = k[..., None], kc[..., None], sign[..., None], w0[..., None]
+    sn, cn, dn = ellipj(w0 * t, k**2)
+    theta = 2 * sign * np.arcsin(np.clip(k * cn / dn, -1.0, 1.0))
+    omega = -2 * sign * k * kc * w0 * sn / dn
+    return theta, omega
+
+
+def simulate(theta0, omega0=0.0, g=g, L=L, dt=0.01, steps=1000, method='euler-cromer'):
+    # Step a batch of pendulums (one lane per entry of the broadcast
+    # parameters) with integrators.ACCEL_METHODS; returns (time, theta, omega)
+    # with a leading time axis. 'euler' and 'euler-cromer' are the updates of
+    # simple pendulum.py.
+    if method not in ACCEL_METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {sorted(ACCEL_METHODS)}")
+    step = ACCEL_METHODS[method]
+    theta, omega, w2 = (np.array(p, dtype=float) for p in np.broadcast_arrays(
+        theta0, omega0, np.asarray(g, dtype=float) / np.asarray(L, dtype=float)))
+
+    def accel(x):
+        return -w2 * np.sin(x)
+    accel = instrument.wrap(accel, 'force_evals', 'force')
+    instrument.count('steps', steps)
+
+    Theta = np.empty((steps + 1,) + theta.shape)
+    Omega = np.empty((steps + 1,) + theta.shape)
+    Theta[0], Omega[0] = theta, omega
+    a = accel(theta)
+    for n in range(steps):
+        a = step(theta, omega, a, accel, dt)
+        Theta[n+1], Omega[n+1] = theta, omega
+    return dt * np.arange(steps + 1), Theta, Omega
@@ -0,0 +1,324 @@
+import argparse
+import contextlib
+import os
+import sys
+import time
+import tomllib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import instrument
+from integrators import (integrate, shm_rhs, damped_rhs, pendulum_rhs, rlc_rhs,
+                         drag_fall_rhs, projectile_rhs)
+from linear_models import solve_linear
+from lorentz import simulate_lorentz
+from nbody import NBodySystem
+from orbits import simulate_orbit, orbit_energy
+from pendulum import trajectory
+from recorders import Recorder
+from wax import WaxCooling
+
+# Command line runner for declarative scenario files.
+#
+#   python physsim.py run scenarios.toml [more.toml ...] [--only NAME] [--no-plots]
+#   python physsim.py models
+#
+# A scenario file holds one scenario at the top level or several as
+# [[scenario]] tables; a [defaults] table is merged into every scenario:
+#
+#   [defaults]
+#   out_dir = "runs"
+#
+#   [[scenario]]
+#   name = "shm"             # output files are <out_dir>/<name>.npz and .png
+#   model = "shm"            # see MODELS
+#   integrator = "euler-cromer"
+#   dt = 0.01
+#   steps = 5000
+#   every = 10               # keep every 10th step
+#   plot = false
+#   parameters = {k = 1.0, m = 1.0, x0 = 1.0, v0 = 0.0}
+#
+# Instead of steps, t_end may be given (steps = t_end / dt).
+# Parameters given as lists run as batch lanes side by side. The kernels never
+# import matplotlib; it is only loaded (headless, via render.py) for
+# scenarios with plot = true.
+
+MODELS = {}
+
+
+def model(name, integrator, **defaults):
+    # Register a kernel(params, method, dt, steps, every) -> (t, data, plot)
+    # where data maps names to arrays of shape (samples, batch) and plot is
+    # (x name, y names, xlabel, ylabel)
+    def register(kernel):
+        MODELS[name] = {'kernel': kernel, 'integrator': integrator, 'parameters': defaults}
+        return kernel
+    return register
+
+
+def _state(p, *components):
+    # Initial (batch, dim) state from per-component scalars or lane lists, with
+    # one lane per entry of the longest list among the parameters
+    batch = max(np.size(value) for value in p.values())
+    return np.column_stack([np.broadcast_to(c, batch) for c in components])
+
+
+def _integrate(rhs, y0, method, dt, steps, every, names):
+    _, rec = integrate(rhs, y0, dt, steps, method, recorder=Recorder(every=every))
+    states = rec.states
+    return rec.t, {name: states[:, :, i] for i, name in enumerate(names)}
+
+
+@model('shm', 'euler-cromer', k=1.0, m=1.0, x0=1.0, v0=0.0)
+def run_shm(p, method, dt, steps, every):
+    t, data = _integrate(shm_rhs(p['k'], p['m']), _state(p, p['x0'], p['v0']),
+                         method, dt, steps, every, ('x', 'v'))
+    return t, data, ('t', ['x'], 'Time (s)', 'Displacement (m)')
+
+
+@model('damped', 'euler-cromer', k=1.0, m=1.0, b=0.1, x0=1.0, v0=0.0)
+def run_damped(p, method, dt, steps, every):
+    t, data = _integrate(damped_rhs(p['k'], p['m'], p['b']), _state(p, p['x0'], p['v0']),
+                         method, dt, steps, every, ('x', 'v'))
+    return t, data, ('t', ['x'], 'Time (s)', 'Displacement (m)')
+
+
+@model('pendulum', 'euler-cromer', g=9.8, L=1.0, theta0=0.2, omega0=0.0)
+def run_pendulum(p, method, dt, steps, every):
+    # method 'exact' evaluates the Jacobi elliptic solution (released from rest)
+    if method == 'exact':
+        if np.any(np.asarray(p['omega0']) != 0):
+            raise ValueError("the exact pendulum solution needs omega0 = 0")
+        t = dt * np.arange(0, steps + 1, every)
+        theta0, g, L = np.broadcast_arrays(*(np.atleast_1d(p[k]) for k in ('theta0', 'g', 'L')))
+        theta, omega = trajectory(t, theta0, g, L)
+        return t, {'theta': theta.T, 'omega': omega.T}, ('t', ['theta'], 'Time (s)', 'Angle (rad)')
+    t, data = _integrate(pendulum_rhs(p['g'], p['L']), _state(p, p['theta0'], p['omega0']),
+                         method, dt, steps, every, ('theta', 'omega'))
+    return t, data, ('t', ['theta'], 'Time (s)', 'Angle (rad)')
+
+
+@model('rlc', 'euler-cromer', R=10.0, L=1.0, C=0.1, V0=10.0, omega=5.0, Q0=0.0, I0=0.0)
+def run_rlc(p, method, dt, steps, every):
+    rhs = rlc_rhs(p['R'], p['L'], p['C'], p['V0'], p['omega'])
+    t, data = _integrate(rhs, _state(p, p['Q0'], p['I0']), method, dt, steps, every, ('Q', 'I'))
+    return t, data, ('t', ['I'], 'Time (s)', 'Current (A)')
+
+
+@model('free-fall', 'euler-cromer', g=9.8, k=0.1, m=1.0, y0=100.0, v0=0.0)
+def run_free_fall(p, method, dt, steps, every):
+    rhs = drag_fall_rhs(p['g'], p['k'], p['m'])
+    t, data = _integrate(rhs, _state(p, p['y0'], p['v0']), method, dt, steps, every, ('y', 'v'))
+    return t, data, ('t', ['y'], 'Time (s)', 'Height (m)')
+
+
+@model('projectile', 'euler-cromer', g=9.81, c=0.0, m=1.0, S=0.0, spin=0.0, v0=50.0, angle=45.0)
+def run_projectile(p, method, dt, steps, every):
+    rhs = projectile_rhs(p['g'], p['c'], p['m'], p['S'], p['spin'])
+    theta = np.radians(p['angle'])
+    y0 = _state(p, 0.0, 0.0, p['v0'] * np.cos(theta), p['v0'] * np.sin(theta))
+    t, data = _integrate(rhs, y0, method, dt, steps, every, ('x', 'y', 'vx', 'vy'))
+    return t, data, ('x', ['y'], 'x (m)', 'y (m)')
+
+
+@model('orbit', 'verlet', vx0=2 * np.pi, G=4 * np.pi**2, M=1.0, m=3e-6)
+def run_orbit(p, method, dt, steps, every):
+    vx0 = np.atleast_1d(np.asarray(p['vx0'], dtype=float))
+    x, y, energy = simulate_orbit(method, vx0, dt, dt * steps, p['G'], p['M'], p['m'])
+    # simulate_orbit starts its energy series after the first step
+    r0, v0 = np.column_stack((np.ones_like(vx0), 0 * vx0)), np.column_stack((0 * vx0, vx0))
+    energy = np.vstack((orbit_energy(r0, v0, p['G'], p['M'], p['m']), energy))
+    t = dt * np.arange(steps + 1)
+    data = {'x': x, 'y': y, 'energy': energy}
+    return t[::every], {k: v[::every] for k, v in data.items()}, ('x', ['y'], 'x (AU)', 'y (AU)')
+
+
+@model('lorentz', 'boris', v0=[1e5, 0.0, 0.0], r0=[0.0, 0.0, 0.0], E=[0.0, 0.0, 500.0],
+       B=[0.0, 0.0, 0.01], q=1.6e-19, m=1.67e-27)
+def run_lorentz(p, method, dt, steps, every):
+    v0 = np.array(p['v0'], dtype=float, ndmin=2)
+    r, v = simulate_lorentz(v0, method, p['E'], p['B'], p['q'], p['m'], dt, steps + 1, p['r0'])
+    t = dt * np.arange(steps + 1)
+    data = {name: a[..., i] for a, names in ((r, 'xyz'), (v, ('vx', 'vy', 'vz')))
+            for i, name in enumerate(names)}
+    return t[::every], {k: v[::every] for k, v in data.items()}, ('x', ['y'], 'x (m)', 'y (m)')
+
+
+@model('relaxation', 'exact', y0=100.0, y_inf=0.0, k=0.1)
+def run_relaxation(p, method, dt, steps, every):
+    # dy/dt = -k (y - y_inf): decay, absorption, capacitors, Newton cooling
+    y0, y_inf, k = np.broadcast_arrays(*(np.atleast_1d(p[name]) for name in ('y0', 'y_inf', 'k')))
+    t, y = solve_linear(y0, y_inf, k, dt, steps + 1, method)
+    return t[::every], {'y': y.T[::every]}, ('t', ['y'], 'Time', 'y')
+
+
+@model('wax', 'exact', m=0.5, h=1.7, A=0.1, T_init=90.0, T_env=25.0, T_solid=70.0,
+       c_liquid=2100.0, c_solid=1800.0, L=200000.0)
+def run_wax(p, method, dt, steps, every):
+    # Closed-form liquid / solidification plateau / solid cooling curve
+    if method != 'exact':
+        raise ValueError(f"unknown method {method!r}, the wax model is solved exactly")
+    cooling = WaxCooling(**{k: np.atleast_1d(v) for k, v in p.items()})
+    t = dt * np.arange(0, steps + 1, every)
+    data = {'T': cooling.temperature(t).T, 'liquid_fraction': cooling.liquid_fraction(t).T}
+    return t, data, ('t', ['T'], 'Time (s)', 'Temperature (°C)')
+
+
+@model('nbody', 'verlet', bodies=[], G=4 * np.pi**2, softening=0.0, force='direct')
+def run_nbody(p, method, dt, steps, every):
+    # bodies: [[scenario.parameters.bodies]] tables with mass, position, velocity, name
+    system = NBodySystem.from_bodies(p['bodies'], G=p['G'], softening=p['softening'],
+                                     force=p['force'])
+    rec = system.run(dt, steps, method, recorder=Recorder(every=every))
+    pos, vel = rec.states
+    data = {}
+    for i, name in enumerate(system.names):
+        data[f'{name}_x'], data[f'{name}_y'] = pos[:, i, 0:1], pos[:, i, 1:2]
+    return rec.t, data, (None, system.names, 'x', 'y')
+
+
+def _scenarios(document, source):
+    defaults = document.get('defaults', {})
+    if 'scenario' in document:
+        entries = document['scenario']
+    elif 'model' in document:
+        entries = [{k: v for k, v in document.items() if k != 'defaults'}]
+    else:
+        raise ValueError(f"{source}: no [[scenario]] tables and no top-level model")
+    stem = os.path.splitext(os.path.basename(source))[0]
+    for i, entry in enumerate(entries):
+        sc = {**defaults, **entry}
+        dt = float(sc.get('dt', 0.01))
+        steps = int(sc['steps']) if 'steps' in sc else int(round(sc.get('t_end', 10.0) / dt))
+        sc['parameters'] = {**defaults.get('parameters', {}), **entry.get('parameters', {})}
+        if sc.get('model') not in MODELS:
+            raise ValueError(f"{source}: unknown model {sc.get('model')!r}, "
+                             f"expected one of {sorted(MODELS)}")
+        spec = MODELS[sc['model']]
+        unknown = set(sc['parameters']) - set(spec['parameters'])
+        if unknown:
+            raise ValueError(f"{source}: unknown parameters {sorted(unknown)} for model "
+                             f"{sc['model']!r}, expected {sorted(spec['parameters'])}")
+        name = sc.get('name', f"{stem}-{i}" if len(entries) > 1 else stem)
+        # Lane lists run side by side, so they must all have the same length
+        lanes = {key: np.size(value) for key, value in sc['parameters'].items()
+                 if np.size(value) != 1}
+        if len(set(lanes.values())) > 1:
+            raise ValueError(f"{source}: scenario {name!r} has parameter lists of different "
+                             f"lengths {lanes}, expected one shared length or single values")
+        yield {
+            'name': name,
+            'model': sc['model'],
+            'parameters': {**spec['parameters'], **sc['parameters']},
+            'integrator': sc.get('integrator', spec['integrator']),
+            'dt': dt,
+            'steps': steps,
+            'every': int(sc.get('every', 1)),
+            'plot': bool(sc.get('plot', False)),
+            'save': bool(sc.get('save', True)),
+            'out_dir': sc.get('out_dir', '.'),
+        }
+
+
+def load_scenarios(path):
+    with open(path, 'rb') as f:
+        return list(_scenarios(tomllib.load(f), path))
+
+
+def run_scenario(sc):
+    # Run one loaded scenario; returns (t, data) and writes the requested files
+    kernel = MODELS[sc['model']]['kernel']
+    t, data, (x_name, y_names, xlabel, ylabel) = kernel(
+        sc['parameters'], sc['integrator'], sc['dt'], sc['steps'], sc['every'])
+    base = os.path.join(sc['out_dir'], sc['name'])
+    if sc['save'] or sc['plot']:
+        os.makedirs(sc['out_dir'], exist_ok=True)
+    if sc['save']:
+        with instrument.phase('record'):
+            np.savez(base + '.npz', t=t, **data)
+    if sc['plot']:
+        from render import render_figure
+        series = []
+        for y_name in y_names:
+            if x_name is None:  # N-body: one orbit per body
+                x, y = data[f'{y_name}_x'], data[f'{y_name}_y']
+            else:
+                x = t[:, None] if x_name == 't' else data[x_name]
+                y = data[y_name]
+            for lane in range(y.shape[1]):
+                label = y_name if y.shape[1] == 1 else f"{y_name} [{lane}]"
+                series.append({'x': np.broadcast_to(x, y.shape)[:, lane], 'y': y[:, lane],
+                               'label': label})
+        render_figure({'title': sc['name'], 'xlabel': xlabel, 'ylabel': ylabel,
+                       'equal': x_name != 't', 'series': series}, base + '.png')
+    return t, data
+
+
+def _run_timed(sc):
+    start = time.perf_counter()
+    run_scenario(sc)
+    return sc['name'], time.perf_counter() - start
+
+
+def run_scenarios(scenarios, max_workers=1):
+    # Yields (name, seconds) as scenarios finish, in order
+    if max_workers == 1 or len(scenarios) <= 1:
+        for sc in scenarios:
+            yield _run_timed(sc)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        yield from pool.map(_run_timed, scenarios)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='physsim', description="Run simulation scenarios.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help="run the scenarios in one or more TOML files")
+    run.add_argument('files', nargs='+')
+    run.add_argument('--only', nargs='+', metavar='NAME', help="run only these scenarios")
+    run.add_argument('--out-dir', help="override out_dir of every scenario")
+    run.add_argument('--no-plots', action='store_true', help="skip all plots")
+    run.add_argument('--workers', type=int, default=1, help="worker processes (default 1)")
+    run.add_argument('--timings', action='store_true',
+                     help="print counters and per-phase times (in-process runs only)")
+    run.add_argument('--profile', metavar='FILE', help="write a cProfile pstats file")
+    commands.add_parser('models', help="list the models and their parameters")
+    args = parser.parse_args(argv)
+
+    if args.command == 'models':
+        for name, spec in MODELS.items():
+            params = ', '.join(f"{k}={v!r}" for k, v in spec['parameters'].items())
+            print(f"{name:12s} integrator={spec['integrator']!r}  {params}")
+        return 0
+
+    try:
+        scenarios = [sc for path in args.files for sc in load_scenarios(path)]
+    except (OSError, ValueError, tomllib.TOMLDecodeError) as exc:
+        parser.error(str(exc))
+    if args.only:
+        missing = set(args.only) - {sc['name'] for sc in scenarios}
+        if missing:
+            parser.error(f"no scenarios named {', '.join(sorted(missing))}")
+        scenarios = [sc for sc in scenarios if sc['name'] in args.only]
+    for sc in scenarios:
+        if args.out_dir:
+            sc['out_dir'] = args.out_dir
+        if args.no_plots:
+            sc['plot'] = False
+
+    workers = 1 if args.timings or args.profile else args.workers
+    if args.timings:
+        instrument.enable()
+    context = instrument.profile(args.profile) if args.profile else contextlib.nullcontext()
+    with context:
+        for name, seconds in run_scenarios(scenarios, workers):
+            print(f"{name:30s}{seconds:10.3f} s", flush=True)
+    if args.timings:
+        print(instrument.summary())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import numpy as np
+
+from events import crossed, hermite, locate
+
+# Grid sweep of projectiles with quadratic air resistance, as in
+# exc  projectile different c.py, integrated for every (c, angle, v0)
+# combination at once. Trajectories that have landed are dropped from the
+# working arrays, so they stop costing anything. The landing point and the
+# apex are located inside the step where y, respectively vy, changes sign
+# instead of at the nearest sample. Launches at angles <= 0 land at t = 0.
+
+
+class SweepResult:
+
+    def __init__(self, c, angle, v0, flight_time, range_, max_height, energy_loss):
+        # Every array has shape (len(c), len(angle), len(v0)); nan where the
+        # projectile had not landed after max_steps
+        self.c = c
+        self.angle = angle      # Launch angles (radians)
+        self.v0 = v0
+        self.flight_time = flight_time
+        self.range = range_
+        self.max_height = max_height
+        self.energy_loss = energy_loss  # Initial minus landing energy (J)
+
+    def table(self):
+        # One row per combination as a structured array
+        C, A, V = np.meshgrid(self.c, self.angle, self.v0, indexing='ij')
+        columns = [('c', C), ('angle', A), ('v0', V), ('flight_time', self.flight_time),
+                   ('range', self.range), ('max_height', self.max_height),
+                   ('energy_loss', self.energy_loss)]
+        rows = np.empty(C.size, dtype=[(name, float) for name, _ in columns])
+        for name, values in columns:
+            rows[name] = values.ravel()
+        return rows
+
+
+def _derivative(s, k, g):
+    # d/dt of states [x, y, vx, vy] under gravity and drag -k |v| v
+    speed = np.sqrt(s[:, 2]**2 + s[:, 3]**2)
+    return np.column_stack((s[:, 2], s[:, 3], -k * speed * s[:, 2], -k * speed * s[:, 3] - g))
+
+
+def _zero_in_step(column, t, dt, s0, f0, s1, f1):
+    # Time and state where state[:, column] reaches zero inside the step,
+    # root found on the cubic Hermite interpolant of the step
+    def interp(tc):
+        return hermite(t, s0, f0, t + dt, s1, f1, tc)
+
+    def value(tc, s):
+        return s[:, column]
+
+    tc = locate(value, np.full(len(s0), t), np.full(len(s0), t + dt),
+                s0[:, column], s1[:, column], interp)
+    return tc, interp(tc)
+
+
+def sweep(c_values, angles, v0_values, m=1.0, g=9.81, dt=0.01, max_steps=5000):
+    # Euler-Cromer with air resistance -c |v| v / m, angles in radians
+    c_values = np.atleast_1d(np.asarray(c_values, dtype=float))
+    angles = np.atleast_1d(np.asarray(angles, dtype=float))
+    v0_values = np.atleast_1d(np.asarray(v0_values, dtype=float))
+    C, A, V = (a.ravel() for a in np.meshgrid(c_values, angles, v0_values, indexing='ij'))
+    n = C.size
+
+    flight_time = np.full(n, np.nan)
+    range_ = np.full(n, np.nan)
+    max_height = np.full(n, np.nan)
+    land_speed2 = np.full(n, np.nan)
+
+    # Launched level or downwards from y = 0: on the ground from the start
+    grounded = V * np.sin(A) <= 0
+    flight_time[grounded] = range_[grounded] = max_height[grounded] = 0.0
+    land_speed2[grounded] = V[grounded]**2
+
+    # Working arrays hold only the lanes still in flight; idx maps them back
+    idx = np.flatnonzero(~grounded)
+    k = C[idx] / m
+    x, y = np.zeros(len(idx)), np.zeros(len(idx))
+    vx, vy = V[idx] * np.cos(A[idx]), V[idx] * np.sin(A[idx])
+
+    for step in range(max_steps):
+        if not len(idx):
+            break
+        t = step * dt
+        speed = np.sqrt(vx**2 + vy**2)
+        ax = -k * speed * vx
+        ay = -k * speed * vy - g
+        state_old = np.column_stack((x, y, vx, vy))
+        deriv_old = np.column_stack((vx, vy, ax, ay))
+
+        # Euler-Cromer update
+        vx = vx + ax * dt
+        vy = vy + ay * dt
+        x = x + vx * dt
+        y = y + vy * dt
+
+        apex = crossed(state_old[:, 3], vy, direction=-1)
+        if apex.any():
+            s1 = np.column_stack((x, y, vx, vy))[apex]
+            _, s_apex = _zero_in_step(3, t, dt, state_old[apex], deriv_old[apex],
+                                      s1, _derivative(s1, k[apex], g))
+            max_height[idx[apex]] = s_apex[:, 1]
+
+        landed = crossed(state_old[:, 1], y, direction=-1)
+        if landed.any():
+            s1 = np.column_stack((x, y, vx, vy))[landed]
+            t_land, s_land = _zero_in_step(1, t, dt, state_old[landed], deriv_old[landed],
+                                           s1, _derivative(s1, k[landed], g))
+            out = idx[landed]
+            flight_time[out] = t_land
+            range_[out] = s_land[:, 0]
+            land_speed2[out] = s_land[:, 2]**2 + s_land[:, 3]**2
+
+            keep = ~landed
+            idx, k, x, y, vx, vy = (a[keep] for a in (idx, k, x, y, vx, vy))
+
+    energy_loss = 0.5 * m * (V**2 - land_speed2)  # Both ends at y = 0
+    shape = (len(c_values), len(angles), len(v0_values))
+    return SweepResult(c_values, angles, v0_values,
+                       *(a.reshape(shape) for a in (flight_time, range_, max_height, energy_loss)))
@@ -0,0 +1,117 @@
+import numpy as np
+
+# Output recorders that decouple the number of steps from the output size.
+#
+# An integrator calls recorder.begin(steps, t0, state) once and then
+# recorder(n, t, state) after every step n. The state is an array or a tuple
+# of arrays such as (r, v). What is kept is up to the recorder:
+#
+#   Recorder(every=k)        every k-th step
+#   Recorder(times=[...])    the first step at or after each requested time
+#   Recorder(window=M)       only the last M samples, in a ring buffer
+#
+# Diagnostics such as energy run on their own cadence:
+#   Recorder(every=100, diagnostics={'energy': f}, diagnostics_every=10)
+# where f(t, state) returns a scalar or an array. All buffers are preallocated
+# from the step count passed to begin(), so memory stays flat however many
+# steps are taken.
+
+
+def _components(state):
+    return state if isinstance(state, tuple) else (state,)
+
+
+class Recorder:
+
+    def __init__(self, every=1, times=None, window=None, diagnostics=None,
+                 diagnostics_every=1, sink=None):
+        # sink: optional trajectory_io.TrajectoryWriter that receives the kept
+        # frames instead of memory (array states only)
+        if times is not None and window is not None:
+            raise ValueError("use either times or window, not both")
+        self.every = every
+        self.times = None if times is None else np.sort(np.asarray(times, dtype=float))
+        self.window = window
+        self.diagnostics = dict(diagnostics or {})
+        self.diagnostics_every = diagnostics_every
+        self.sink = sink
+
+    def _wants(self, n, t):
+        if self.times is not None:
+            return self._next_time < len(self.times) and t >= self.times[self._next_time]
+        return n % self.every == 0
+
+    def begin(self, steps, t0, state):
+        comps = _components(state)
+        self._tuple = isinstance(state, tuple)
+        if self.window is not None:
+            size = self.window
+        elif self.times is not None:
+            size = len(self.times)
+        else:
+            size = steps // self.every + 1
+        self._t = np.empty(size)
+        self._buffers = None if self.sink is not None else [
+            np.empty((size,) + np.shape(c), dtype=np.result_type(c, float)) for c in comps]
+        self._count = 0
+        self._next_time = 0
+
+        # Diagnostics get buffers only when there are any; in window mode they
+        # are a ring too, covering the same span of steps as the samples
+        if not self.diagnostics:
+            d_size = 0
+        elif self.window is not None:
+            d_size = self.window * self.every // self.diagnostics_every + 1
+        else:
+            d_size = steps // self.diagnostics_every + 1
+        self._diag_t = np.empty(d_size)
+        self._diag = {name: np.empty((d_size,) + np.shape(f(t0, state)))
+                      for name, f in self.diagnostics.items()}
+        self._diag_count = 0
+        self(0, t0, state)
+
+    def __call__(self, n, t, state):
+        if self.diagnostics and n % self.diagnostics_every == 0:
+            i = self._diag_count % len(self._diag_t)
+            self._diag_t[i] = t
+            for name, f in self.diagnostics.items():
+                self._diag[name][i] = f(t, state)
+            self._diag_count += 1
+
+        while self._wants(n, t):
+            i = self._count % len(self._t) if self.window is not None else self._count
+            self._t[i] = t
+            if self.sink is not None:
+                self.sink.append(state)
+            else:
+                for buf, c in zip(self._buffers, _components(state)):
+                    buf[i] = c
+            self._count += 1
+            if self.times is None:
+                break
+            self._next_time += 1  # One step may cover several requested times
+
+    def _order(self, count=None, size=None):
+        # Indices of the kept samples in time order (unrolls the ring buffer)
+        count = self._count if count is None else count
+        size = len(self._t) if size is None else size
+        if self.window is not None and count > size:
+            return (np.arange(size) + count) % size
+        return np.arange(min(count, size))
+
+    @property
+    def t(self):
+        return self._t[self._order()]
+
+    @property
+    def states(self):
+        if self._buffers is None:
+            return self.sink.array()
+        order = self._order()
+        kept = tuple(buf[order] for buf in self._buffers)
+        return kept if self._tuple else kept[0]
+
+    def diagnostic(self, name):
+        # (times, values) of one diagnostic
+        order = self._order(self._diag_count, len(self._diag_t))
+        return self._diag_t[order], self._diag[name][order]
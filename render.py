@@ -0,0 +1,127 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import instrument
+
+# Headless figure rendering for batch runs.
+#
+# Figures are drawn with the Agg canvas directly (no pyplot, no plt.show()),
+# so nothing blocks and worker processes share no global figure state. Every
+# series is downsampled before plotting so a million-point trajectory costs
+# about as much to draw as a few thousand points.
+#
+# A figure is described by a plain dict, which keeps it cheap to send to
+# worker processes:
+#
+#   {'title': ..., 'xlabel': ..., 'ylabel': ..., 'figsize': (10, 5),
+#    'grid': True, 'legend': True, 'equal': False, 'xscale': 'linear', 'yscale': 'linear',
+#    'series': [{'x': x, 'y': y, 'label': 'Euler', 'linestyle': 'dashed'}, ...]}
+#
+# Any extra keys of a series are passed to Axes.plot.
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: indices of n_out points that keep the
+    # visual shape of the series (first and last points always kept)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # Average point of every bucket, used as the third triangle corner
+    sums_x = np.add.reduceat(x[1:n-1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n-1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        area = np.abs((x[a] - avg_x[b + 1]) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (avg_y[b + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[b + 1] = a
+    return keep
+
+
+def minmax(x, y, n_out):
+    # Min/max envelope: the lowest and highest point of each of n_out / 2
+    # buckets, in order, fully vectorized. Buckets have n // buckets points
+    # and the last one also takes the remainder, so every sample is scanned.
+    n = len(y)
+    buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.arange(n)
+    size = n // buckets
+    split = size * (buckets - 1)
+    body = y[:split].reshape(buckets - 1, size)
+    start = np.arange(buckets - 1) * size
+    tail = y[split:]
+    lo = np.append(start + np.argmin(body, axis=1), split + np.argmin(tail))
+    hi = np.append(start + np.argmax(body, axis=1), split + np.argmax(tail))
+    keep = np.sort(np.concatenate((lo, hi, [0, n - 1])))
+    return np.unique(keep)
+
+
+DOWNSAMPLERS = {'lttb': lttb, 'minmax': minmax}
+
+
+def downsample(x, y, n_out=2000, method='lttb'):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = DOWNSAMPLERS[method](x, y, n_out)
+    return x[keep], y[keep]
+
+
+def render_figure(spec, path, max_points=2000, method='lttb', dpi=100):
+    # Draw one figure spec to path; the format follows the extension (.png, .svg, ...)
+    instrument.count('figures')
+    with instrument.phase('plot'):
+        return _draw(spec, path, max_points, method, dpi)
+
+
+def _draw(spec, path, max_points, method, dpi):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=spec.get('figsize', (10, 5)))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    for series in spec.get('series', []):
+        series = dict(series)
+        x, y = series.pop('x', None), series.pop('y')
+        if x is None:
+            x = np.arange(len(y))
+        ax.plot(*downsample(x, y, max_points, method), **series)
+    ax.set_title(spec.get('title', ''))
+    ax.set_xlabel(spec.get('xlabel', ''))
+    ax.set_ylabel(spec.get('ylabel', ''))
+    ax.set_xscale(spec.get('xscale', 'linear'))
+    ax.set_yscale(spec.get('yscale', 'linear'))
+    if spec.get('equal'):
+        ax.axis('equal')
+    if spec.get('grid', True):
+        ax.grid()
+    if spec.get('legend', True) and any('label' in s for s in spec.get('series', [])):
+        ax.legend()
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def _render(job):
+    spec, path, kwargs = job
+    return render_figure(spec, path, **kwargs)
+
+
+def render_many(jobs, max_workers=None, **kwargs):
+    # jobs: iterable of (spec, path). Rendered in parallel worker processes.
+    jobs = [(spec, path, kwargs) for spec, path in jobs]
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_render(job) for job in jobs]
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
@@ -0,0 +1,105 @@
+import numpy as np
+
+from instrumentation import instrument
+
+# Frequency response of the driven series RLC circuit of RLC.py,
+#
+#   L Q'' + R Q' + Q / C = V0 cos(omega t),   I = Q'
+#
+# The steady state is the phasor solution: with the impedance
+# Z = R + i (omega L - 1 / (omega C)), the current is Re(V0 / Z e^(i omega t))
+# and the charge Re(V0 / (i omega Z) e^(i omega t)). Amplitude, phase and the
+# resonance metrics are closed-form, so a sweep over any number of
+# (R, L, C, omega) points is a handful of array operations. All parameters
+# broadcast against each other (np.meshgrid them for a full grid); time
+# grids are laid out along the last axis, as in linear_models.py.
+#
+# transient() steps batches of circuits from their initial conditions with
+# the Euler and Euler-Cromer updates of RLC.py. The drive cos(omega t) is
+# precomputed for a block of steps at a time rather than once per step, and
+# only once for all lanes when they share omega.
+
+# Parameters
+R = 10.0   # Resistance (Ohms)
+L = 1.0    # Inductance (H)
+C = 0.1    # Capacitance (F)
+V0 = 10.0  # External voltage amplitude (V)
+omega = 5.0  # Angular frequency (rad/s)
+
+DRIVE_BLOCK = 1 << 22  # Drive waveform values computed at once (32 MiB)
+
+
+def impedance(R, L, C, omega):
+    omega = np.asarray(omega, dtype=float)
+    return R + 1j * (omega * L - 1.0 / (omega * C))
+
+
+def phasor(R=R, L=L, C=C, V0=V0, omega=omega):
+    # Complex current amplitude V0 / Z; the charge phasor is this / (i omega)
+    return np.asarray(V0, dtype=float) / impedance(R, L, C, omega)
+
+
+def frequency_response(R=R, L=L, C=C, V0=V0, omega=omega):
+    # Steady-state current amplitude (A) and its phase relative to the drive
+    # (rad, positive when the current leads), and the charge amplitude (C)
+    I_hat = phasor(R, L, C, V0, omega)
+    amplitude = np.abs(I_hat)
+    return {'amplitude': amplitude, 'phase': np.angle(I_hat),
+            'charge': amplitude / np.asarray(omega, dtype=float)}
+
+
+def steady_state(t, R=R, L=L, C=C, V0=V0, omega=omega):
+    # Steady-state charge and current at time(s) t, laid out along the last axis
+    omega = np.asarray(omega, dtype=float)
+    I_hat = phasor(R, L, C, V0, omega)
+    Q_hat = I_hat / (1j * omega)
+    t = np.asarray(t, dtype=float)
+    if t.ndim:
+        I_hat, Q_hat = I_hat[..., None], Q_hat[..., None]
+        omega = np.broadcast_to(omega, I_hat.shape[:-1])[..., None]
+    rotation = np.exp(1j * omega * t)
+    return np.real(Q_hat * rotation), np.real(I_hat * rotation)
+
+
+def resonance(R=R, L=L, C=C):
+    # Resonance frequency, quality factor, bandwidth and half-power
+    # frequencies of the current response
+    R, L, C = np.broadcast_arrays(*(np.asarray(p, dtype=float) for p in (R, L, C)))
+    omega0 = 1.0 / np.sqrt(L * C)
+    bandwidth = R / L
+    half = bandwidth / 2
+    upper = np.sqrt(half**2 + omega0**2) + half
+    return {'omega0': omega0, 'Q': omega0 / bandwidth, 'bandwidth': bandwidth,
+            'omega_low': upper - bandwidth, 'omega_high': upper}
+
+
+def transient(R=R, L=L, C=C, V0=V0, omega=omega, Q0=0.0, I0=0.0, dt=0.01, steps=1000,
+              method='euler-cromer', every=1):
+    # Step a batch of circuits, one lane per entry of the broadcast parameters;
+    # returns times and charge and current every `every` steps, each
+    # (samples, batch)
+    if method not in ('euler', 'euler-cromer'):
+        raise ValueError(f"unknown method {method!r}, expected 'euler' or 'euler-cromer'")
+    R, L, C, V0, omega, Q, I = (np.array(p, dtype=float).ravel() for p in np.broadcast_arrays(
+        *(np.atleast_1d(p) for p in (R, L, C, V0, omega, Q0, I0))))
+    instrument.count('steps', steps)
+    samples = steps // every + 1
+    Qs = np.empty((samples,) + Q.shape)
+    Is = np.empty((samples,) + Q.shape)
+    Qs[0], Is[0] = Q, I
+    damping, stiffness, drive = dt * R / L, dt / (L * C), V0 * dt / L
+    if np.all(omega == omega[0]):
+        omega = omega[:1]
+    block = max(1, DRIVE_BLOCK // len(omega))
+
+    for start in range(0, steps, block):
+        n_block = min(block, steps - start)
+        wave = np.cos(np.outer(dt * np.arange(start, start + n_block), omega))
+        for n in range(n_block):
+            I_new = I + drive * wave[n] - damping * I - stiffness * Q
+            Q += (I_new if method == 'euler-cromer' else I) * dt
+            I = I_new
+            step = start + n + 1
+            if step % every == 0:
+                Qs[step // every], Is[step // every] = Q, I
+    return dt * every * np.arange(samples), Qs, Is
@@ -0,0 +1,140 @@
+import numpy as np
+
+from instrumentation import instrument
+from integrators import ACCEL_METHODS
+
+# Mass-spring lattices in 2D or 3D.
+#
+# spring_force is the one in coupled osc 2dim.py, applied to every spring at
+# once: springs are an edge list, spring e joining node i[e] to node j[e] with
+# rest length rest[e] and stiffness k[e]. The force on the i end is
+# -k (|d| - rest) d / |d| with d = r_i - r_j; the j end gets the opposite
+# force, and both are scatter-added onto the nodes with one bincount. Fixed
+# anchors are nodes in the `fixed` mask: they take part in springs but never
+# move. The single mass between four anchors of the scripts is
+# SpringLattice.anchored_mass().
+
+
+def spring_force(d, rest, k):
+    # d: (E, dim) spring vectors r_i - r_j; a spring of zero length exerts no force
+    dist = np.sqrt(np.sum(d**2, axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(dist > 0, -k * (dist - rest) / dist, 0.0)
+    return scale[:, None] * d
+
+
+class SpringLattice:
+
+    def __init__(self, pos, i, j, k=10.0, rest=None, mass=1.0, fixed=None):
+        # rest defaults to the spring lengths at pos (a lattice at rest)
+        self.pos = np.array(pos, dtype=float)
+        self.vel = np.zeros_like(self.pos)
+        n, dim = self.pos.shape
+        self.i = np.asarray(i, dtype=np.int64)
+        self.j = np.asarray(j, dtype=np.int64)
+        self.k = np.broadcast_to(np.asarray(k, dtype=float), self.i.shape).copy()
+        if rest is None:
+            rest = np.sqrt(np.sum((self.pos[self.i] - self.pos[self.j])**2, axis=1))
+        self.rest = np.broadcast_to(np.asarray(rest, dtype=float), self.i.shape).copy()
+        self.mass = np.broadcast_to(np.asarray(mass, dtype=float), (n,)).copy()
+        self.fixed = np.zeros(n, dtype=bool) if fixed is None else np.asarray(fixed, dtype=bool)
+        self.t = 0.0
+        self._acc = None
+
+        # Flat scatter targets: node * dim + axis for the i ends, then the j ends
+        axes = np.arange(dim)
+        self._targets = np.concatenate((self.i[:, None] * dim + axes,
+                                        self.j[:, None] * dim + axes)).ravel()
+
+    @classmethod
+    def grid(cls, shape, spacing=1.0, diagonals=False, **kwargs):
+        # Nodes on a regular 2D or 3D grid joined to their axis neighbours
+        # (and face diagonals in 2D when diagonals=True, for shear stiffness)
+        shape = tuple(shape)
+        index = np.arange(np.prod(shape)).reshape(shape)
+        pos = np.stack(np.meshgrid(*(spacing * np.arange(s) for s in shape), indexing='ij'),
+                       axis=-1).reshape(-1, len(shape))
+        pairs = []
+        for axis in range(len(shape)):
+            lo = [slice(None)] * len(shape)
+            hi = [slice(None)] * len(shape)
+            lo[axis], hi[axis] = slice(None, -1), slice(1, None)
+            pairs.append((index[tuple(lo)].ravel(), index[tuple(hi)].ravel()))
+        if diagonals and len(shape) == 2:
+            pairs.append((index[:-1, :-1].ravel(), index[1:, 1:].ravel()))
+            pairs.append((index[1:, :-1].ravel(), index[:-1, 1:].ravel()))
+        i = np.concatenate([p[0] for p in pairs])
+        j = np.concatenate([p[1] for p in pairs])
+        return cls(pos, i, j, **kwargs)
+
+    @classmethod
+    def anchored_mass(cls, r0=(0.5, 0.0), v0=(0.0, 1.0), k=10.0, m=1.0, L=1.0):
+        # coupled osc 2dim.py: one mass at r0 held by four springs of natural
+        # length L to fixed anchors at (0, +-L) and (+-L, 0)
+        pos = np.array([r0, (0, L), (0, -L), (L, 0), (-L, 0)], dtype=float)
+        lattice = cls(pos, [0, 0, 0, 0], [1, 2, 3, 4], k=k, rest=L, mass=m,
+                      fixed=[False, True, True, True, True])
+        lattice.vel[0] = v0
+        return lattice
+
+    def __len__(self):
+        return len(self.pos)
+
+    def forces(self, pos=None):
+        pos = self.pos if pos is None else pos
+        f = spring_force(pos[self.i] - pos[self.j], self.rest, self.k)
+        total = np.bincount(self._targets, weights=np.concatenate((f, -f)).ravel(),
+                            minlength=pos.size)
+        return total.reshape(pos.shape)
+
+    def accelerations(self, pos=None):
+        # Fixed nodes get zero acceleration
+        return self.forces(pos) * np.where(self.fixed, 0.0, 1.0 / self.mass)[:, None]
+
+    def step(self, dt, method='euler-cromer'):
+        # method is any of integrators.ACCEL_METHODS
+        if method not in ACCEL_METHODS:
+            raise ValueError(f"unknown method {method!r}, expected one of {sorted(ACCEL_METHODS)}")
+        accel = instrument.wrap(self.accelerations, 'force_evals', 'force')
+        if self._acc is None:
+            self._acc = accel()
+        self._acc = ACCEL_METHODS[method](self.pos, self.vel, self._acc, accel, dt)
+        self.t += dt
+        instrument.count('steps')
+
+    def run(self, dt, steps, method='euler-cromer', record=True, sink=None, recorder=None):
+        # Same output options as nbody.NBodySystem.run
+        self._acc = None
+        self.vel[self.fixed] = 0.0
+        if recorder is not None:
+            recorder.begin(steps, self.t, (self.pos, self.vel))
+            keep = instrument.wrap(recorder, 'records', 'record')
+            for n in range(steps):
+                self.step(dt, method)
+                keep(n + 1, self.t, (self.pos, self.vel))
+            return recorder
+        if sink is not None or not record:
+            if sink is not None:
+                append = instrument.wrap(sink.append, 'records', 'record')
+                append(self.pos)
+            for _ in range(steps):
+                self.step(dt, method)
+                if sink is not None:
+                    append(self.pos)
+            return self.pos
+        trajectory = np.empty((steps + 1,) + self.pos.shape)
+        trajectory[0] = self.pos
+        for n in range(steps):
+            self.step(dt, method)
+            trajectory[n+1] = self.pos
+        return trajectory
+
+    def kinetic_energy(self):
+        return 0.5 * np.sum(self.mass * np.sum(self.vel**2, axis=1))
+
+    def potential_energy(self):
+        dist = np.sqrt(np.sum((self.pos[self.i] - self.pos[self.j])**2, axis=1))
+        return 0.5 * np.sum(self.k * (dist - self.rest)**2)
+
+    def energy(self):
+        return self.kinetic_energy() + self.potential_energy()
@@ -0,0 +1,132 @@
+import hashlib
+import itertools
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Parameter sweeps over a scenario function, spread over worker processes and
+# memoized on disk.
+#
+# A scenario is a module-level function taking keyword parameters, e.g.
+# scenario(R=10.0, L=1.0, C=0.1, V0=10.0, omega=5.0), so that it can be sent to
+# worker processes. Every result is cached under a hash of the scenario name
+# and its parameters, so re-running a sweep after extending one axis only
+# computes the new points.
+
+
+def parameter_grid(**axes):
+    # Cartesian product of the axes as a list of parameter dicts
+    names = list(axes)
+    values = [np.atleast_1d(axes[name]).tolist() for name in names]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def _plain(value):
+    # JSON-able form of parameters so equal values always hash equally
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
+
+
+def cache_key(scenario, params):
+    name = f"{scenario.__module__}.{scenario.__qualname__}"
+    text = json.dumps([name, params], sort_keys=True, default=_plain)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    # One pickle file per result. Reads touch the file's modification time, so
+    # eviction removes the least recently used results once the directory
+    # grows past max_bytes.
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None, False
+        os.utime(path)
+        return value, True
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)  # Never leave a half-written entry behind
+
+    def size(self):
+        return sum(os.path.getsize(e.path) for e in os.scandir(self.directory)
+                   if e.name.endswith('.pkl'))
+
+    def evict(self):
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path)
+                   for e in os.scandir(self.directory) if e.name.endswith('.pkl')]
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for e in os.scandir(self.directory):
+            if e.name.endswith('.pkl'):
+                os.remove(e.path)
+
+
+def _call(job):
+    scenario, params = job
+    return scenario(**params)
+
+
+def run_sweep(scenario, grid, cache=None, max_workers=None, chunksize=None):
+    # Results come back in grid order. max_workers=1 runs in this process.
+    grid = list(grid)
+    results = [None] * len(grid)
+    todo = []
+    for i, params in enumerate(grid):
+        if cache is not None:
+            value, hit = cache.get(cache_key(scenario, params))
+            if hit:
+                results[i] = value
+                continue
+        todo.append(i)
+
+    jobs = [(scenario, grid[i]) for i in todo]
+    pool = None
+    if max_workers == 1 or len(jobs) <= 1:
+        computed = map(_call, jobs)
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        if chunksize is None:
+            chunksize = max(1, len(jobs) // (4 * workers))
+        pool = ProcessPoolExecutor(max_workers=workers)
+        computed = pool.map(_call, jobs, chunksize=chunksize)
+
+    try:
+        for i, value in zip(todo, computed):
+            results[i] = value
+            if cache is not None:
+                cache.put(cache_key(scenario, grid[i]), value)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if cache is not None and todo:
+        cache.evict()
+    return results
@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+
+# Streaming trajectory output.
+#
+# Instead of growing a Python list of frames (trajectory.append(r.copy())) and
+# converting it at the end, frames are copied into a fixed-size chunk buffer
+# that is written to disk whenever it fills up. Memory use is one chunk no
+# matter how long the run is, and the finished file is opened as a
+# memory-mapped array.
+#
+# '.npy' files are written directly: a header with room for any shape is
+# reserved up front and rewritten with the final frame count on close.
+# '.h5'/'.hdf5' files use a resizable HDF5 dataset and need h5py.
+
+HEADER_BYTES = 256  # Reserved .npy header, a multiple of 64 as the format expects
+MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def _npy_header(dtype, shape):
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype),
+                   'fortran_order': False, 'shape': tuple(shape)})
+    room = HEADER_BYTES - len(MAGIC) - 2 - 1
+    if len(header) > room:
+        raise ValueError(f"shape {shape} does not fit the reserved .npy header")
+    header = header.ljust(room) + '\n'
+    return MAGIC + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+
+class TrajectoryWriter:
+
+    def __init__(self, path, frame_shape, chunk_size=4096, dtype=np.float64, dataset='trajectory'):
+        self.path = path
+        self.frame_shape = (frame_shape,) if np.isscalar(frame_shape) else tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.buffer = np.empty((chunk_size,) + self.frame_shape, dtype=self.dtype)
+        self.filled = 0
+        self.frames = 0
+        self.closed = False
+
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.npy':
+            self.format = 'npy'
+            self._file = open(path, 'wb')
+            self._file.write(_npy_header(self.dtype, (0,) + self.frame_shape))
+        elif ext in ('.h5', '.hdf5'):
+            try:
+                import h5py
+            except ImportError as exc:
+                raise ImportError("writing HDF5 trajectories requires h5py") from exc
+            self.format = 'hdf5'
+            self.dataset = dataset
+            self._file = h5py.File(path, 'w')
+            self._dset = self._file.create_dataset(
+                dataset, shape=(0,) + self.frame_shape, maxshape=(None,) + self.frame_shape,
+                chunks=(chunk_size,) + self.frame_shape, dtype=self.dtype)
+        else:
+            raise ValueError(f"unsupported trajectory file {path!r}, use .npy, .h5 or .hdf5")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.frames
+
+    def append(self, frame):
+        self.buffer[self.filled] = frame
+        self.filled += 1
+        self.frames += 1
+        if self.filled == self.chunk_size:
+            self.flush()
+
+    def extend(self, frames):
+        frames = np.asarray(frames, dtype=self.dtype)
+        i = 0
+        while i < len(frames):
+            take = min(self.chunk_size - self.filled, len(frames) - i)
+            self.buffer[self.filled:self.filled + take] = frames[i:i + take]
+            self.filled += take
+            self.frames += take
+            i += take
+            if self.filled == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        if not self.filled:
+            return
+        chunk = self.buffer[:self.filled]
+        if self.format == 'npy':
+            self._file.write(chunk.tobytes())
+        else:
+            start = len(self._dset)
+            self._dset.resize(start + self.filled, axis=0)
+            self._dset[start:] = chunk
+        self.filled = 0
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        if self.format == 'npy':
+            self._file.seek(0)
+            self._file.write(_npy_header(self.dtype, (self.frames,) + self.frame_shape))
+        self._file.close()
+        self.closed = True
+
+    def array(self):
+        # The finished trajectory as a read-only memory-mapped array
+        self.close()
+        return open_trajectory(self.path, getattr(self, 'dataset', 'trajectory'))
+
+
+def open_trajectory(path, dataset='trajectory'):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return np.load(path, mmap_mode='r')
+    import h5py
+    return h5py.File(path, 'r')[dataset]
+
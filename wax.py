@@ -0,0 +1,109 @@
+import numpy as np
+
+# Exact piecewise solution of the wax cooling model in wax project.py.
+#
+# Newton cooling dT/dt = -h A (T - T_env) / (m c) has an exponential solution,
+# so the curve is three analytic segments joined at two event times:
+#
+#   liquid     T_init -> T_solid, rate k_liquid = h A / (m c_liquid)
+#   plateau    T = T_solid while the latent heat m L leaves at the constant
+#              rate h A (T_solid - T_env), lasting m L / (h A (T_solid - T_env))
+#   solid      T_solid -> T_env, rate k_solid = h A / (m c_solid)
+#
+# Nothing is stepped: the event times are closed-form and the curve can be
+# evaluated at any times. m, h, A, T_init and T_env may be arrays (one wax
+# part per entry); they broadcast against each other and time grids are laid
+# out along the last axis, as in linear_models.py. A part that starts below
+# T_solid is taken to be solid already.
+
+# Given parameters
+T_env = 25  # Ambient temperature (°C)
+T_init = 90  # Initial temperature (°C)
+T_solid = 70  # Solidification temperature (°C)
+m = 0.5  # Mass of wax (kg)
+c_liquid = 2100  # J/kgK (Liquid heat capacity)
+c_solid = 1800  # J/kgK (Solid heat capacity)
+L = 200000  # J/kg (Latent heat of fusion)
+h = 1.7  # W/K (Heat transfer coefficient)
+A = 0.1  # Surface area (m^2)
+
+
+class WaxCooling:
+
+    def __init__(self, m=m, h=h, A=A, T_init=T_init, T_env=T_env, T_solid=T_solid,
+                 c_liquid=c_liquid, c_solid=c_solid, L=L):
+        m, h, A, T_init, T_env, T_solid, c_liquid, c_solid, L = np.broadcast_arrays(
+            *(np.asarray(p, dtype=float) for p in
+              (m, h, A, T_init, T_env, T_solid, c_liquid, c_solid, L)))
+        if np.any(T_solid <= T_env):
+            raise ValueError("T_solid must be above T_env for the wax to solidify")
+        self.shape = m.shape
+        self.T_init, self.T_env, self.T_solid = T_init, T_env, T_solid
+        hA = h * A
+        self.k_liquid = hA / (m * c_liquid)
+        self.k_solid = hA / (m * c_solid)
+
+        liquid = T_init >= T_solid
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.t_freeze = np.where(liquid, np.log((T_init - T_env) / (T_solid - T_env))
+                                     / self.k_liquid, 0.0)
+        self.plateau = np.where(liquid, m * L / (hA * (T_solid - T_env)), 0.0)
+        self.t_solid = self.t_freeze + self.plateau
+        # Temperature the solid segment starts from
+        self.T_start_solid = np.where(liquid, T_solid, T_init)
+
+    @property
+    def events(self):
+        # Start and end of solidification
+        return {'freeze_start': self.t_freeze, 'freeze_end': self.t_solid}
+
+    def _grid(self, t):
+        # Parameters as (..., 1) against times t (..., n), or elementwise for
+        # a scalar t
+        t = np.asarray(t, dtype=float)
+        if t.ndim == 0:
+            return t, lambda p: p
+        return t, lambda p: p[..., None]
+
+    def temperature(self, t):
+        # One exponential for all three segments: before the freeze it decays
+        # from T_init, afterwards from T_solid with the time since the plateau
+        # ended, which is clipped to 0 on the plateau itself
+        t, col = self._grid(t)
+        T_env = col(self.T_env)
+        liquid = t < col(self.t_freeze)
+        elapsed = np.where(liquid, t, t - col(self.t_solid))
+        np.maximum(elapsed, 0.0, out=elapsed)
+        elapsed *= np.where(liquid, -col(self.k_liquid), -col(self.k_solid))
+        T = np.exp(elapsed, out=elapsed)
+        T *= np.where(liquid, col(self.T_init) - T_env, col(self.T_start_solid) - T_env)
+        T += T_env
+        return T
+
+    def liquid_fraction(self, t):
+        # Heat leaves at a constant rate on the plateau, so the liquid fraction
+        # falls linearly from 1 to 0 across it
+        t, col = self._grid(t)
+        t_freeze, plateau = col(self.t_freeze), col(self.plateau)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.clip(1.0 - (t - t_freeze) / plateau, 0.0, 1.0)
+        return np.where(t < t_freeze + plateau, np.where(t < t_freeze, 1.0, frac), 0.0)
+
+    def time_to(self, T):
+        # Time at which each part first cools to temperature T (inf at or below
+        # T_env); reaching T_solid means the start of the plateau
+        T, col = self._grid(T)
+        T_env, T_solid = col(self.T_env), col(self.T_solid)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            liquid = np.log((col(self.T_init) - T_env) / (T - T_env)) / col(self.k_liquid)
+            solid = col(self.t_solid) + np.log(
+                (col(self.T_start_solid) - T_env) / (T - T_env)) / col(self.k_solid)
+        t = np.where(T >= T_solid, liquid, solid)
+        t = np.where(T >= col(self.T_init), 0.0, t)
+        return np.where(T <= T_env, np.inf, t)
+
+
+def cooling_curve(t, **params):
+    # Temperature at times t for the script's parameters, any of which can be
+    # overridden or given per part
+    return WaxCooling(**params).temperature(t)